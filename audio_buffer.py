@@ -0,0 +1,126 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from metrics import observe
+
+# Capture configuration
+audio_queue_frames = int(os.getenv("AUDIO_QUEUE_FRAMES", "64"))
+audio_overflow_policy = os.getenv("AUDIO_OVERFLOW_POLICY", "drop_oldest")  # block | drop_oldest | coalesce
+audio_max_send_bytes = int(os.getenv("AUDIO_MAX_SEND_BYTES", "32768"))
+overflow_policies = ("block", "drop_oldest", "coalesce")
+
+
+class AudioFrameRing:
+    """Bounded pool of pre-allocated PCM frames between the PortAudio thread and the event loop
+
+    The capture callback copies each block into a free pooled frame (no
+    per-block allocation) and the loop side hands out memoryviews of those
+    frames. When every frame is queued the overflow policy decides:
+
+    - ``block``: the capture thread waits up to one block for a free frame,
+      then drops the incoming block
+    - ``drop_oldest``: the oldest queued block is discarded
+    - ``coalesce``: like ``drop_oldest`` on overflow, but a backed-up queue
+      is drained into one larger send instead of many small ones
+    """
+
+    def __init__(self, frame_bytes, capacity=audio_queue_frames, policy=audio_overflow_policy,
+                 max_send_bytes=audio_max_send_bytes, block_seconds=0.128, loop=None):
+        if policy not in overflow_policies:
+            raise ValueError(f"Unknown audio overflow policy: {policy}")
+        self.loop = loop or asyncio.get_running_loop()
+        self.policy = policy
+        self.block_seconds = block_seconds
+        self.frames = [bytearray(frame_bytes) for _ in range(capacity)]
+        self.free = deque(range(capacity))
+        self.ready = deque()  # (slot, nbytes, captured_at)
+        self.in_use = []  # slots handed to the consumer, released on the next get()
+        self.send_buffer = bytearray(max(max_send_bytes, frame_bytes))
+        self.cond = threading.Condition()
+        self.data_ready = asyncio.Event()
+        self.status = None
+        self.last_captured_at = None
+        self.delays = deque(maxlen=512)  # recent capture-to-send delays in seconds
+        self.counters = {"captured": 0, "dropped": 0, "sent": 0, "coalesced": 0, "max_depth": 0}
+
+    def put(self, indata, status=None):
+        """Copy one captured block into the ring (called on the PortAudio thread)"""
+        with self.cond:
+            self.status = status
+            self.counters["captured"] += 1
+            if not self.free and self.policy == "block":
+                self.cond.wait_for(lambda: self.free, timeout=self.block_seconds)
+                if not self.free:
+                    self.counters["dropped"] += 1
+                    return
+            if not self.free:
+                slot, _, _ = self.ready.popleft()
+                self.free.append(slot)
+                self.counters["dropped"] += 1
+
+            slot = self.free.popleft()
+            size = len(indata)
+            memoryview(self.frames[slot])[:size] = indata
+            self.ready.append((slot, size, time.monotonic()))
+            self.counters["max_depth"] = max(self.counters["max_depth"], len(self.ready))
+        self.loop.call_soon_threadsafe(self.data_ready.set)
+
+    def _release(self):
+        if self.in_use:
+            with self.cond:
+                self.free.extend(self.in_use)
+                self.in_use = []
+                self.cond.notify_all()
+
+    async def get(self):
+        """Wait for audio and return (buffer, status)
+
+        The returned memoryview is only valid until the next call to get().
+        """
+        self._release()
+        while True:
+            with self.cond:
+                if self.ready:
+                    break
+                self.data_ready.clear()
+            await self.data_ready.wait()
+
+        with self.cond:
+            if self.policy == "coalesce" and len(self.ready) > 1:
+                view = memoryview(self.send_buffer)
+                total = 0
+                _, _, captured_at = self.ready[0]
+                while self.ready and total + self.ready[0][1] <= len(self.send_buffer):
+                    slot, size, _ = self.ready.popleft()
+                    view[total:total + size] = memoryview(self.frames[slot])[:size]
+                    total += size
+                    self.free.append(slot)
+                    self.counters["coalesced"] += 1
+                self.cond.notify_all()
+                chunk = view[:total]
+            else:
+                slot, size, captured_at = self.ready.popleft()
+                self.in_use.append(slot)
+                chunk = memoryview(self.frames[slot])[:size]
+            self.last_captured_at = captured_at
+            return chunk, self.status
+
+    def mark_sent(self):
+        """Record the capture-to-send delay of the chunk returned by the last get()"""
+        if self.last_captured_at is not None:
+            delay = time.monotonic() - self.last_captured_at
+            self.delays.append(delay)
+            observe("audio.capture_to_send", delay * 1000)
+            self.counters["sent"] += 1
+
+    def metrics(self):
+        delays = sorted(self.delays)
+        return {
+            **self.counters,
+            "depth": len(self.ready),
+            "policy": self.policy,
+            "send_delay_avg_ms": sum(delays) / len(delays) * 1000 if delays else 0.0,
+            "send_delay_max_ms": delays[-1] * 1000 if delays else 0.0,
+        }
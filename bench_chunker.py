@@ -0,0 +1,122 @@
+"""Replay TranscriptEvent sequences through TranscriptChunker and measure throughput
+
+Usage:
+    python bench_chunker.py                      # synthetic talk with partial revisions
+    python bench_chunker.py --events talk.jsonl  # recorded events, one per line
+
+test_chunker.py checks that the chunks reproduce the synthetic talk.
+
+A recorded line looks like
+    {"results": [{"result_id": "r1", "is_partial": true, "transcript": "...",
+                  "items": [{"content": "Hello", "item_type": "pronunciation",
+                             "start_time": 0.1, "end_time": 0.4, "stable": true}]}]}
+"""
+import argparse
+import json
+import random
+import time
+from amazon_transcribe.model import Alternative, Item, Result, Transcript, TranscriptEvent
+from chunker import TranscriptChunker
+
+vocabulary = (
+    "the speaker said our funding grew by 3.5 million dollars last year and NASA "
+    "partners will join the pilot in Lagos next quarter we expect results soon"
+).split()
+
+
+def make_event(result_id, words, is_partial, stable_count, start=0.0):
+    items = []
+    for i, word in enumerate(words):
+        punctuation = word[-1] if word[-1] in ".?!," else None
+        content = word.rstrip(".?!,")
+        t = start + i * 0.3
+        items.append(Item(start_time=t, end_time=t + 0.25, item_type="pronunciation",
+                          content=content, stable=i < stable_count))
+        if punctuation:
+            items.append(Item(start_time=t + 0.25, end_time=t + 0.25, item_type="punctuation",
+                              content=punctuation, stable=i < stable_count))
+    result = Result(result_id=result_id, start_time=start, end_time=start + len(words) * 0.3,
+                    is_partial=is_partial,
+                    alternatives=[Alternative(transcript=" ".join(words), items=items)])
+    return TranscriptEvent(transcript=Transcript(results=[result]))
+
+
+def synthetic_talk(total_words=20000, seed=7):
+    """Yield (events, spoken words) for a talk with Transcribe-style partial revisions"""
+    rng = random.Random(seed)
+    events, spoken = [], []
+    segment = 0
+    while len(spoken) < total_words:
+        length = rng.randint(8, 30)
+        words = [rng.choice(vocabulary) for _ in range(length)]
+        if rng.random() < 0.5:
+            words[-1] += "."
+        start = len(spoken) * 0.3
+        result_id = f"seg-{segment}"
+        # Partial revisions grow the result; the tail word is sometimes revised
+        for upto in range(2, length, 3):
+            partial = words[:upto]
+            if rng.random() < 0.3:
+                partial = partial[:-1] + ["uh"]
+            events.append(make_event(result_id, partial, True, max(0, upto - 3), start))
+        events.append(make_event(result_id, words, False, length, start))
+        spoken.extend(words)
+        segment += 1
+    return events, spoken
+
+
+def load_events(path):
+    events = []
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            results = []
+            for r in record["results"]:
+                items = [Item(**item) for item in r.get("items", [])]
+                results.append(Result(result_id=r["result_id"], is_partial=r["is_partial"],
+                                      start_time=r.get("start_time"), end_time=r.get("end_time"),
+                                      alternatives=[Alternative(transcript=r["transcript"], items=items)]))
+            events.append(TranscriptEvent(transcript=Transcript(results=results)))
+    return events
+
+
+def run(events, chunk_size=200, overlap_size=70):
+    chunker = TranscriptChunker(chunk_size=chunk_size, overlap_size=overlap_size)
+    chunks = []
+    started = time.perf_counter()
+    for event in events:
+        for result in event.transcript.results:
+            chunks.extend(chunker.add_result(result))
+    tail = chunker.flush()
+    if tail:
+        chunks.append(tail)
+    elapsed = time.perf_counter() - started
+    return chunker, chunks, elapsed
+
+
+def strip_overlap(chunks, overlap_size):
+    """Rebuild the committed word stream from overlapping chunks"""
+    words, previous = [], []
+    for chunk in chunks:
+        chunk_words = chunk["text"].split()
+        overlap = min(len(previous), overlap_size)
+        words.extend(chunk_words[overlap:])
+        previous = (previous + chunk_words[overlap:])[-overlap_size:]
+    return words
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", help="JSON-lines file of recorded transcript events")
+    parser.add_argument("--words", type=int, default=20000, help="length of the synthetic talk")
+    args = parser.parse_args()
+
+    if args.events:
+        events = load_events(args.events)
+    else:
+        events, _ = synthetic_talk(args.words)
+
+    chunker, chunks, elapsed = run(events)
+    print(f"events={len(events)} words={chunker.words_seen} chunks={len(chunks)}")
+    print(f"{chunker.words_seen / elapsed:,.0f} words/s ({elapsed * 1000:.1f} ms)")
+
@@ -0,0 +1,187 @@
+"""Offline end-to-end benchmark of ingestion and chat with local stand-ins
+
+Usage:
+    python bench_pipeline.py                      # synthetic talk, compared to the baseline
+    python bench_pipeline.py --events talk.jsonl  # recorded TranscriptEvents (bench_chunker format)
+    python bench_pipeline.py --save-baseline      # record the current numbers as the baseline
+
+Transcript events are replayed into the real MyEventHandler as fast as it
+accepts them. Embeddings and chat answers come from fakes.FakeBedrock /
+FakeAsyncBedrock with fixed latencies, and vectors go to the in-memory
+store, so runs are deterministic apart from scheduling noise. The question
+load then goes through retrieval.answer_from_event from a thread pool.
+
+A metric that is worse than the baseline by more than --tolerance is
+reported as a regression and the exit status is 1.
+"""
+import os
+import tempfile
+
+# Offline configuration; must be in place before the pipeline modules are imported
+os.environ.setdefault("VECTOR_STORE", "memory")
+os.environ.setdefault("EVENT_ID", "bench")
+os.environ.setdefault("MODEL_ID", "bench-chat-model")
+os.environ.setdefault("METRICS_DUMP_INTERVAL", "0")
+os.environ.setdefault("SUMMARY_DIR", tempfile.mkdtemp(prefix="bench-summaries-"))
+os.environ.setdefault("LIVE_TAIL_DIR", tempfile.mkdtemp(prefix="bench-tail-"))
+os.environ.setdefault("CACHE_GENERATION_FILE", os.path.join(tempfile.mkdtemp(prefix="bench-"), "generation"))
+os.environ.setdefault("LEXICAL_FOLLOW_LOG", "0")  # Ingest and queries share this process
+os.environ.setdefault("EMBEDDING_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-"), "embeddings.sqlite"))
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from clients import manager
+from fakes import FakeBedrock, FakeAsyncBedrock
+from bench_chunker import synthetic_talk, load_events, vocabulary
+from prompt_layout import PromptLayout
+import main
+import ragEmbed
+import retrieval
+
+baseline_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+# metric -> True when higher is better
+tracked_metrics = {
+    "chunks_per_sec": True,
+    "ingest_lag_p95_ms": False,
+    "query_qps": True,
+    "query_p95_ms": False,
+}
+
+bench_prompt = PromptLayout("Answer questions about the event using the context.")
+
+
+class BenchHandler(main.MyEventHandler):
+    """MyEventHandler that also times each chunk from emission to upsert"""
+
+    def __init__(self, event_id):
+        super().__init__(None, chunk_log=None, event_id=event_id)
+        self.emitted_at = {}
+        self.lags_ms = []
+
+    async def log_chunk(self, chunk_text, metadata):
+        chunk_id, offset = await super().log_chunk(chunk_text, metadata)
+        self.emitted_at[chunk_id] = time.perf_counter()
+        return chunk_id, offset
+
+    async def upsert_to_vector_db(self, chunk, chunk_id, offset=None, metadata=None):
+        await super().upsert_to_vector_db(chunk, chunk_id, offset, metadata)
+        self.lags_ms.append((time.perf_counter() - self.emitted_at.pop(chunk_id)) * 1000)
+
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+async def run_ingest(events):
+    handler = BenchHandler(os.environ["EVENT_ID"])
+    started = time.perf_counter()
+    for event in events:
+        await handler.handle_transcript_event(event)
+    chunk = handler.chunker.flush()
+    if chunk:
+        await handler.store_chunk(chunk)
+    await handler.pool.drain()  # Every chunk is embedded and upserted here
+    elapsed = time.perf_counter() - started
+    # The rest of final_flush waits for the rolling summary's model calls, which is not ingestion
+    started = time.perf_counter()
+    await handler.final_flush()
+    handler.summary_seconds = time.perf_counter() - started
+    await ragEmbed.shutdown()
+    return handler, elapsed
+
+
+def run_queries(count, concurrency, seed=11):
+    rng = random.Random(seed)
+    questions = [f"what did the speaker say about {' '.join(rng.sample(vocabulary, 3))}?" for _ in range(count)]
+
+    def ask(question):
+        started = time.perf_counter()
+        retrieval.answer_from_event(question, bench_prompt)
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(ask, questions))
+    return latencies, time.perf_counter() - started
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, higher_is_better in tracked_metrics.items():
+        old, new = baseline.get(name), results.get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > tolerance else "ok"
+        print(f"  {name:<20} baseline {old:10.1f}  now {new:10.1f}  ({change:+.0%}) {flag}")
+        if worse > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", help="JSON-lines file of recorded transcript events")
+    parser.add_argument("--words", type=int, default=20000, help="length of the synthetic talk")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per fake embedding")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per fake chat answer")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    async_bedrock = FakeAsyncBedrock(embed_latency=args.embed_latency, latency=args.llm_latency)
+    manager.override(
+        bedrock=FakeBedrock(latency=args.llm_latency, embed_latency=args.embed_latency),
+        async_bedrock=async_bedrock,
+    )
+
+    events = load_events(args.events) if args.events else synthetic_talk(args.words)[0]
+    handler, ingest_seconds = asyncio.run(run_ingest(events))
+    latencies, query_seconds = run_queries(args.queries, args.concurrency)
+
+    lag = percentiles(handler.lags_ms)
+    query = percentiles(latencies)
+    results = {
+        "events": len(events),
+        "words": handler.chunker.words_seen,
+        "chunks": handler.chunks_upserted,
+        "embeddings": async_bedrock.embeddings,
+        "chunks_per_sec": handler.chunks_upserted / ingest_seconds,
+        "words_per_sec": handler.chunker.words_seen / ingest_seconds,
+        "ingest_lag_p50_ms": lag["p50"],
+        "ingest_lag_p95_ms": lag["p95"],
+        "ingest_lag_p99_ms": lag["p99"],
+        "query_qps": len(latencies) / query_seconds,
+        "query_p50_ms": query["p50"],
+        "query_p95_ms": query["p95"],
+        "query_p99_ms": query["p99"],
+        "summary_flush_ms": handler.summary_seconds * 1000,
+        "embed_latency": args.embed_latency,
+        "llm_latency": args.llm_latency,
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print("Against baseline:")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,83 @@
+"""Measure import time, import-time network access and Streamlit rerun overhead
+
+Usage:
+    python bench_startup.py                   # imports + both Streamlit apps
+    python bench_startup.py --app rag_query.py --reruns 20
+
+Each module is imported in a fresh interpreter with outgoing connections
+refused, so any network I/O at import shows up as a count instead of a hang.
+The apps are then run with Streamlit's AppTest: the first run is the cold
+start, later runs are the per-interaction rerun cost. AppTest sessions are
+not logged in, so each rerun includes streamlit-authenticator's fixed
+pre-login cookie wait (0.7s); logged-in reruns skip it.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+modules = ["clients", "vector_store", "retrieval", "ragEmbed", "main"]
+apps = ["rag_query.py", "test_streamlit.py"]
+
+import_probe = """
+import json, socket, sys, time
+attempts = []
+def refuse(self, address):
+    attempts.append(str(address))
+    raise ConnectionRefusedError("network disabled while importing")
+socket.socket.connect = refuse
+started = time.perf_counter()
+error = None
+try:
+    __import__(sys.argv[1])
+except BaseException as e:
+    error = repr(e)
+print(json.dumps({"ms": (time.perf_counter() - started) * 1000, "connects": attempts, "error": error}))
+"""
+
+
+def time_import(module):
+    output = subprocess.run(
+        [sys.executable, "-c", import_probe, module], capture_output=True, text=True
+    ).stdout.strip().splitlines()
+    return json.loads(output[-1]) if output else {"ms": None, "connects": [], "error": "no output"}
+
+
+def time_app(path, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(path, default_timeout=60)
+    started = time.perf_counter()
+    app.run()
+    cold = (time.perf_counter() - started) * 1000
+    rerun_ms = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app.run()
+        rerun_ms.append((time.perf_counter() - started) * 1000)
+    return cold, rerun_ms, [str(e.value) for e in app.exception]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", action="append", help="Streamlit script to time (default: both apps)")
+    parser.add_argument("--reruns", type=int, default=10, help="reruns timed after the cold start")
+    parser.add_argument("--skip-apps", action="store_true", help="only time module imports")
+    args = parser.parse_args()
+
+    for module in modules:
+        result = time_import(module)
+        line = f"import {module:<14} {result['ms'] or 0:8.1f} ms  network calls={len(result['connects'])}"
+        if result["error"]:
+            line += f"  error={result['error']}"
+        print(line)
+
+    if not args.skip_apps:
+        for path in args.app or apps:
+            cold, rerun_ms, errors = time_app(path, args.reruns)
+            print(f"{path:<20} cold {cold:8.1f} ms  rerun median {statistics.median(rerun_ms):.1f} ms "
+                  f"max {max(rerun_ms):.1f} ms over {len(rerun_ms)}")
+            for error in errors:
+                print(f"  exception: {error}")
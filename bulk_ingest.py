@@ -0,0 +1,151 @@
+"""Ingest recorded audio and existing transcripts faster than real time
+
+Usage:
+    python bulk_ingest.py talk1.wav talk2.wav --event keynote-2024
+    python bulk_ingest.py session.pcm --sample-rate 16000
+    python bulk_ingest.py notes.txt events.jsonl --concurrency 8
+
+.wav and .pcm files (16-bit mono) are streamed through Amazon Transcribe
+without real-time pacing. .txt transcripts are split into words with
+timings estimated from --words-per-second. .jsonl files are recorded
+TranscriptEvents (bench_chunker format) and are replayed directly. Every
+file goes through MyEventHandler and its chunker. Embeddings and upserts
+are shared across files, so the embed batcher fills whole batches.
+
+Files share one rolling summary of the event when they are ingested one
+at a time (--concurrency 1 or a single file). Concurrent files would
+interleave their chunks in it, so the summary is off for them. The live
+tail is always off, because nothing is being said live.
+"""
+import os
+import sys
+import time
+import wave
+import asyncio
+import argparse
+from main import MyEventHandler, open_transcribe_stream, start_event
+from event_summary import RollingSummary
+from live_tail import LiveTail
+from ragEmbed import warm_up, shutdown
+from audio_buffer import audio_max_send_bytes
+from bench_chunker import load_events
+
+words_per_second = 2.5  # typical speaking rate, for transcripts without timings
+
+
+def read_audio(path, sample_rate):
+    """PCM bytes and sample rate of a 16-bit mono .wav or raw .pcm file"""
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as f:
+            if f.getsampwidth() != 2 or f.getnchannels() != 1:
+                raise ValueError(f"{path}: expected 16-bit mono audio")
+            return f.readframes(f.getnframes()), f.getframerate()
+    with open(path, "rb") as f:
+        return f.read(), sample_rate
+
+
+def bulk_handler(output_stream, event_id, summary):
+    # Recorded audio has no staleness to bound: its timestamps are in the past
+    # and every word is chunked by final_flush at the end of the file
+    return MyEventHandler(output_stream, event_id=event_id, summary=summary, live_tail=LiveTail(event_id, words=0),
+                          max_staleness=0)
+
+
+async def ingest_audio(path, event_id, sample_rate, region, summary):
+    from amazon_transcribe.client import TranscribeStreamingClient
+
+    audio, rate = read_audio(path, sample_rate)
+    duration = len(audio) / 2 / rate
+    stream = await open_transcribe_stream(TranscribeStreamingClient(region=region), rate)
+    handler = bulk_handler(stream.output_stream, event_id, summary)
+    # Chunk timestamps place the recording so that it ended when the file was written
+    handler.chunker.stream_started_at = os.path.getmtime(path) - duration
+
+    async def send():
+        view = memoryview(audio)
+        for start in range(0, len(view), audio_max_send_bytes):
+            await stream.input_stream.send_audio_event(audio_chunk=bytes(view[start:start + audio_max_send_bytes]))
+        await stream.input_stream.end_stream()
+
+    try:
+        await asyncio.gather(send(), handler.handle_events())
+    finally:
+        await handler.final_flush()  # Keeps the chunks already cut if the stream fails
+    return handler, duration
+
+
+async def ingest_transcript(path, event_id, summary, rate=words_per_second):
+    handler = bulk_handler(None, event_id, summary)
+    try:
+        if path.lower().endswith(".jsonl"):
+            for event in load_events(path):
+                await handler.handle_transcript_event(event)
+        else:
+            with open(path) as f:
+                words = f.read().split()
+            handler.chunker.stream_started_at = os.path.getmtime(path) - len(words) / rate
+            await handler.add_words((word, i / rate, (i + 1) / rate) for i, word in enumerate(words))
+    finally:
+        await handler.final_flush()
+    tail = handler.chunker.overlap
+    duration = tail[-1][2] if tail else 0.0  # End offset of the last word
+    return handler, duration
+
+
+async def bulk_ingest(paths, event_id=None, concurrency=4, sample_rate=16000, region="us-east-1",
+                      rate=words_per_second):
+    event_id = start_event(event_id)
+    await warm_up()
+    slots = asyncio.Semaphore(concurrency)
+    if concurrency == 1 or len(paths) == 1:
+        summary = RollingSummary(event_id)
+    else:
+        summary = RollingSummary(event_id, model_id=None)  # Disabled: concurrent files would interleave
+    totals = {"files": 0, "failed": 0, "audio_seconds": 0.0, "chunks": 0, "words": 0}
+
+    async def one(path):
+        async with slots:
+            started = time.perf_counter()
+            try:
+                if path.lower().endswith((".wav", ".pcm")):
+                    handler, duration = await ingest_audio(path, event_id, sample_rate, region, summary)
+                else:
+                    handler, duration = await ingest_transcript(path, event_id, summary, rate)
+            except Exception as e:
+                print(f"[Bulk] {path} failed: {str(e)}")
+                totals["failed"] += 1
+                return
+            elapsed = time.perf_counter() - started
+            totals["files"] += 1
+            totals["audio_seconds"] += duration
+            totals["chunks"] += handler.chunks_upserted
+            totals["words"] += handler.chunker.words_seen
+            print(f"[Bulk] {path}: {duration / 60:.1f} audio-min, {handler.chunks_upserted} chunks in {elapsed:.1f}s")
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(path) for path in paths))
+    finally:
+        await shutdown()
+    wall = time.perf_counter() - started
+    totals["wall_seconds"] = wall
+    totals["speedup"] = totals["audio_seconds"] / wall if wall else 0.0  # audio-minutes per wall-minute
+    print(f"[Bulk] {totals}")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help=".wav, .pcm, .txt or .jsonl files")
+    parser.add_argument("--event", help="namespace to ingest into (default: a new event)")
+    parser.add_argument("--concurrency", type=int, default=4, help="files processed at once")
+    parser.add_argument("--sample-rate", type=int, default=16000, help="sample rate of raw .pcm files")
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--words-per-second", type=float, default=words_per_second,
+                        help="speaking rate assumed for .txt transcripts")
+    args = parser.parse_args()
+
+    totals = asyncio.run(bulk_ingest(args.paths, args.event, args.concurrency, args.sample_rate, args.region,
+                                     args.words_per_second))
+    print(f"{totals['speedup']:.1f} audio-minutes per wall-minute")
+    sys.exit(1 if totals["failed"] else 0)
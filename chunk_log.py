@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import asyncio
+
+# Write-ahead log configuration
+chunk_log_path = os.getenv("CHUNK_LOG_PATH", "chunk_log.jsonl")
+fsync_interval = float(os.getenv("CHUNK_LOG_FSYNC_INTERVAL", "0.05"))
+fsync_batch = int(os.getenv("CHUNK_LOG_FSYNC_BATCH", "32"))
+
+
+def read_records(path):
+    """Yield (offset, record) for every complete line of a JSON-lines log"""
+    if not os.path.exists(path):
+        return
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # torn write at the tail
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            yield offset, record
+            offset += len(line)
+
+
+def read_generation(path):
+    """How many times the log at path has been compacted"""
+    try:
+        with open(path + ".generation") as f:
+            return int(f.read())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+class ChunkLog:
+    """Append-only, fsync-batched log of chunks written before they are embedded
+
+    Every chunk is appended to ``path`` and made durable before it is handed
+    to the embedding pipeline. Once its upsert is acknowledged, the chunk's
+    byte offset is appended to ``path + ".acked"``. Chunks without an ack
+    are re-ingested by replay after a crash or an outage. Each compaction
+    bumps the counter in ``path + ".generation"`` so readers tailing the
+    log can tell it was rewritten.
+    """
+
+    def __init__(self, path=chunk_log_path, interval=fsync_interval, batch=fsync_batch):
+        self.path = path
+        self.ack_path = path + ".acked"
+        self.interval = interval
+        self.batch = batch
+        self._truncate_torn_tail()
+        self.file = open(self.path, "ab")
+        self.ack_file = open(self.ack_path, "ab")
+        self.size = self.file.tell()
+        self.unsynced = 0
+        self.sync_future = None
+        self.sync_task = None
+        self.batch_full = None
+        self.stats = {"appended": 0, "acked": 0, "fsyncs": 0}
+
+    def _truncate_torn_tail(self):
+        # Drop a partially written last line so new appends start on a clean line
+        for path in (self.path, self.ack_path):
+            if not os.path.exists(path):
+                continue
+            good = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    good += len(line)
+            if os.path.getsize(path) != good:
+                os.truncate(path, good)
+
+    async def append(self, chunk_id, chunk, metadata=None):
+        """Append a chunk and wait until it is durable; returns its offset"""
+        record = {"id": chunk_id, "chunk": chunk, "metadata": metadata or {}, "logged_at": time.time()}
+        data = (json.dumps(record) + "\n").encode()
+        offset = self.size
+        self.file.write(data)
+        self.size += len(data)
+        self.stats["appended"] += 1
+        await self._group_sync()
+        return offset
+
+    def ack(self, offset):
+        """Mark the chunk at offset as upserted; made durable with the next group sync"""
+        self.ack_file.write(f"{offset}\n".encode())
+        self.stats["acked"] += 1
+
+    async def _group_sync(self):
+        # Group commit: appends arriving within `interval` share one fsync
+        loop = asyncio.get_running_loop()
+        if self.sync_future is None:
+            self.sync_future = loop.create_future()
+            self.batch_full = asyncio.Event()
+            self.sync_task = loop.create_task(self._sync_soon(self.sync_future, self.batch_full))
+        self.unsynced += 1
+        if self.unsynced >= self.batch:
+            self.batch_full.set()
+        await asyncio.shield(self.sync_future)
+
+    async def _sync_soon(self, future, batch_full):
+        try:
+            await asyncio.wait_for(batch_full.wait(), self.interval)
+        except asyncio.TimeoutError:
+            pass
+        self.sync_future = None
+        self.unsynced = 0
+        try:
+            self.file.flush()
+            self.ack_file.flush()
+            await asyncio.get_running_loop().run_in_executor(None, self._fsync)
+            future.set_result(None)
+        except Exception as e:
+            future.set_exception(e)
+
+    def _fsync(self):
+        os.fsync(self.file.fileno())
+        os.fsync(self.ack_file.fileno())
+        self.stats["fsyncs"] += 1
+
+    def acked_offsets(self):
+        self.ack_file.flush()
+        acked = set()
+        with open(self.ack_path, "rb") as f:
+            for line in f:
+                if line.endswith(b"\n"):
+                    acked.add(int(line))
+        return acked
+
+    def unacknowledged(self):
+        """Records that were logged but never acknowledged, oldest first"""
+        self.file.flush()
+        acked = self.acked_offsets()
+        return [(offset, record) for offset, record in read_records(self.path) if offset not in acked]
+
+    def compact(self):
+        """Truncate the log once every record in it has been acknowledged"""
+        if self.unacknowledged():
+            return False
+        self.file.truncate(0)
+        self.ack_file.truncate(0)
+        self.file.seek(0)
+        self.ack_file.seek(0)
+        self.size = 0
+        generation_path = self.path + ".generation"
+        with open(generation_path + ".tmp", "w") as f:
+            f.write(str(read_generation(self.path) + 1))
+        os.replace(generation_path + ".tmp", generation_path)
+        return True
+
+    def close(self):
+        self.file.flush()
+        self.ack_file.flush()
+        self._fsync()
+        self.file.close()
+        self.ack_file.close()
@@ -0,0 +1,214 @@
+import re
+import time
+import hashlib
+from datetime import datetime, timezone
+from itertools import islice
+from collections import deque
+
+# Chunking configuration
+chunk_size = 200
+overlap_size = 70
+sentence_end = re.compile(r"[.?!][\"')\]]*$")
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(event_id, start_offset, text):
+    """Deterministic chunk id, so a retried or replayed chunk overwrites itself"""
+    return f"{event_id or 'default'}-{start_offset:.2f}-{content_hash(text)[:16]}"
+
+
+def provisional_chunk_id(event_id, position, session=None):
+    """Id of the provisional chunk whose final version starts at position
+
+    session tells apart handlers that ingest the same event at once, whose
+    positions both count from 0.
+    """
+    if session is None:
+        return f"{event_id or 'default'}-provisional-{position}"
+    return f"{event_id or 'default'}-provisional-{session}-{position}"
+
+
+def result_words(alternative):
+    """Words of a transcript alternative as (text, stable, start, end) tuples
+
+    Punctuation items are folded into the preceding word, and a word only
+    counts as stable once all of its items are stable. Start and end are
+    audio offsets in seconds, or None when Transcribe sent no items.
+    """
+    words = []
+    for item in alternative.items or []:
+        if item.item_type == "punctuation" and words:
+            text, stable, start, end = words[-1]
+            words[-1] = (text + item.content, stable and bool(item.stable), start, end)
+        else:
+            words.append((item.content, bool(item.stable), item.start_time, item.end_time))
+    if not words:
+        words = [(word, False, None, None) for word in alternative.transcript.split()]
+    return words
+
+
+class TranscriptChunker:
+    """Turns Transcribe result revisions into overlapping text chunks
+
+    Only stabilized words are committed: a partial result contributes the
+    stable prefix of its words, and the final revision of a result commits
+    the rest. Pending words and the overlap window are deques, so emitting a
+    chunk never rebuilds the buffer.
+
+    Chunks are dicts holding the text plus the audio offsets (seconds since
+    the stream started) and wall-clock epoch times of their first and last
+    word, and the absolute position of their first new (non-overlap) word.
+
+    With target_seconds set, chunk_size follows the speech rate so a chunk
+    covers roughly that much audio, within [min_size, max_size] words.
+    """
+
+    def __init__(self, chunk_size=chunk_size, overlap_size=overlap_size, min_fill=0.75, stream_started_at=None,
+                 target_seconds=None, min_size=None, max_size=None):
+        self.chunk_size = chunk_size
+        self.overlap_size = overlap_size
+        self.min_fill = min_fill
+        self.min_chunk = max(1, int(chunk_size * min_fill))
+        self.target_seconds = target_seconds
+        self.min_size = min_size or chunk_size
+        self.max_size = max_size or chunk_size
+        self.recent_ends = deque(maxlen=50)  # end offsets of the latest words, for the speech rate
+        self.pending = deque()
+        self.unstable = []  # words of the latest partial result that are not committed yet
+        self.overlap = deque(maxlen=overlap_size)
+        self.sentence_ends = deque()  # absolute positions of sentence-final words
+        self.committed = {}  # result id -> words already committed from it
+        self.consumed = 0  # absolute position of pending[0]
+        self.words_seen = 0
+        self.stream_started_at = time.time() if stream_started_at is None else stream_started_at
+
+    def add_result(self, result):
+        """Commit the newly stabilized words of a result; returns any full chunks"""
+        if not result.alternatives:
+            return []
+        words = result_words(result.alternatives[0])
+        done = self.committed.get(result.result_id, 0)
+
+        if result.is_partial:
+            # Keep the last word back: its trailing punctuation may not have arrived
+            stable = 0
+            while stable < len(words) - 1 and words[stable][1]:
+                stable += 1
+            if stable > done:
+                self.committed[result.result_id] = stable
+            new_words = words[done:stable]
+            self.unstable = [(text, start, end) for text, _, start, end in words[max(done, stable):]]
+        else:
+            self.committed.pop(result.result_id, None)
+            new_words = words[done:]
+            self.unstable = []
+
+        for text, _, start, end in new_words:
+            self.commit_word(text, start, end)
+
+        chunks = []
+        while len(self.pending) >= self.chunk_size:
+            chunks.append(self.cut())
+        return chunks
+
+    def commit_word(self, text, start=None, end=None):
+        position = self.consumed + len(self.pending)
+        if start is None:
+            # No item timing: fall back to the time the word was committed
+            start = end = time.time() - self.stream_started_at
+        self.pending.append((text, start, end))
+        self.words_seen += 1
+        if sentence_end.search(text):
+            self.sentence_ends.append(position)
+        if self.target_seconds:
+            self.recent_ends.append(end)
+            self.adapt_size()
+
+    def speech_rate(self):
+        """Words per second over the latest words, or None until there are enough"""
+        if len(self.recent_ends) < 20:
+            return None
+        span = self.recent_ends[-1] - self.recent_ends[0]
+        return (len(self.recent_ends) - 1) / span if span > 0 else None
+
+    def adapt_size(self):
+        rate = self.speech_rate()
+        if rate is None:
+            return
+        size = min(self.max_size, max(self.min_size, round(rate * self.target_seconds)))
+        self.chunk_size = size
+        self.min_chunk = max(1, int(size * self.min_fill))
+
+    def cut(self, count=None):
+        """Pop a chunk off the pending words, preferring a sentence boundary"""
+        if count is None:
+            count = min(self.chunk_size, len(self.pending))
+            limit = self.consumed + count
+            while self.sentence_ends and self.sentence_ends[0] < self.consumed:
+                self.sentence_ends.popleft()
+            boundary = None
+            for position in self.sentence_ends:
+                if position >= limit:
+                    break
+                boundary = position
+            if boundary is not None and boundary + 1 - self.consumed >= self.min_chunk:
+                count = boundary + 1 - self.consumed
+
+        position = self.consumed
+        words = [self.pending.popleft() for _ in range(count)]
+        self.consumed += count
+        chunk_words = list(self.overlap) + words
+        self.overlap.extend(words)
+        chunk = self.make_chunk(chunk_words)
+        chunk["position"] = position
+        return chunk
+
+    def staleness(self, now=None):
+        """Seconds since the oldest pending word was spoken; 0 when nothing is pending"""
+        if not self.pending:
+            return 0.0
+        now = time.time() if now is None else now
+        return max(0.0, now - (self.stream_started_at + self.pending[0][2]))
+
+    def tail(self, n):
+        """The newest n words not in a chunk yet, as (text, start, end, stable), oldest first"""
+        unstable = [(text, start, end, False) for text, start, end in self.unstable[-n:]]
+        count = min(len(self.pending), n - len(unstable))
+        newest = islice(self.pending, len(self.pending) - count, None)
+        committed = [(text, start, end, True) for text, start, end in newest]
+        return committed + unstable
+
+    def provisional(self):
+        """A chunk of everything pending, without consuming it
+
+        It carries the position its final version will have, so the final
+        chunk can replace it once enough words have arrived.
+        """
+        if not self.pending:
+            return None
+        chunk = self.make_chunk(list(self.overlap) + list(self.pending))
+        chunk["position"] = self.consumed
+        return chunk
+
+    def make_chunk(self, words):
+        start_offset = words[0][1]
+        end_offset = words[-1][2]
+        start_time = self.stream_started_at + start_offset
+        end_time = self.stream_started_at + end_offset
+        return {
+            "text": " ".join(word for word, _, _ in words),
+            "start_offset": start_offset,
+            "end_offset": end_offset,
+            "start_time": start_time,
+            "end_time": end_time,
+            "time_param": datetime.fromtimestamp(start_time, timezone.utc).isoformat(),
+        }
+
+    def flush(self):
+        """Emit whatever is pending as a final, possibly short, chunk"""
+        if not self.pending:
+            return None
+        return self.cut(len(self.pending))
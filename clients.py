@@ -0,0 +1,233 @@
+import os
+import json
+import asyncio
+import atexit
+import threading
+from contextlib import AsyncExitStack
+import boto3
+import aioboto3
+from botocore.config import Config
+from aiobotocore.config import AioConfig
+from pinecone import Pinecone
+
+# Pool configuration shared by every client handed out by the manager
+pool_size = int(os.getenv("CLIENT_POOL_SIZE", "20"))
+keepalive_seconds = float(os.getenv("CLIENT_KEEPALIVE_SECONDS", "60"))
+bedrock_region = os.getenv("BEDROCK_REGION", "us-east-1")
+warmup_model_id = os.getenv("EMB_MODEL_ID", "amazon.titan-embed-text-v2:0")
+# With the index host configured, opening the index skips the describe_index lookup
+pinecone_index_host = os.getenv("PINECONE_INDEX_HOST", "")
+
+
+def _urllib3_pool_stats(pool_manager):
+    """Sum opened connections and served requests over a urllib3 PoolManager"""
+    connections = requests = 0
+    try:
+        pools = pool_manager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests += pool.num_requests
+    except AttributeError:
+        pass
+    return connections, requests
+
+
+def _aiohttp_open_connections(client):
+    """Connections currently open, idle or in use, in an aiobotocore client's aiohttp connectors"""
+    opened = 0
+    try:
+        for session in list(client._endpoint.http_session._sessions.values()):
+            connector = session.connector
+            if connector is not None and not connector.closed:
+                opened += sum(len(idle) for idle in connector._conns.values()) + len(connector._acquired)
+    except AttributeError:
+        pass
+    return opened
+
+
+class ClientManager:
+    """Keeps warm, connection-pooled Bedrock and Pinecone clients for the whole process"""
+
+    def __init__(self, pool_size=pool_size, keepalive_seconds=keepalive_seconds, region=bedrock_region):
+        self.region = region
+        self.sync_config = Config(
+            region_name=region,
+            max_pool_connections=pool_size,
+            tcp_keepalive=keepalive_seconds > 0,
+        )
+        self.async_config = AioConfig(
+            region_name=region,
+            max_pool_connections=pool_size,
+            tcp_keepalive=keepalive_seconds > 0,
+            connector_args={"keepalive_timeout": keepalive_seconds},
+        )
+        self.pool_size = pool_size
+        self.session = aioboto3.Session()
+        self._lock = threading.Lock()
+        self._bedrock = None
+        self._indexes = {}
+        self._async_bedrock = None
+        self._async_loop = None
+        self._exit_stack = None
+        self._async_override = None
+        self._async_lock = None
+        self._async_lock_loop = None
+        self.stats = {"clients_created": 0, "bedrock_requests": 0, "async_requests": 0}
+
+    def _count_request(self, **kwargs):
+        self.stats["bedrock_requests"] += 1
+
+    def _count_async_request(self, **kwargs):
+        self.stats["bedrock_requests"] += 1
+        self.stats["async_requests"] += 1
+
+    def override(self, bedrock=None, async_bedrock=None):
+        """Hand out the given clients instead of real ones (offline benchmarks)"""
+        self._bedrock = bedrock
+        self._async_override = async_bedrock
+
+    def bedrock(self):
+        """Shared synchronous bedrock-runtime client"""
+        if self._bedrock is None:
+            with self._lock:
+                if self._bedrock is None:
+                    client = boto3.client(service_name='bedrock-runtime', config=self.sync_config)
+                    client.meta.events.register("before-send", self._count_request)
+                    self.stats["clients_created"] += 1
+                    self._bedrock = client
+        return self._bedrock
+
+    async def async_bedrock(self):
+        """Shared async bedrock-runtime client bound to the running event loop"""
+        if self._async_override is not None:
+            return self._async_override
+        loop = asyncio.get_running_loop()
+        if self._async_bedrock is not None and self._async_loop is loop:
+            return self._async_bedrock
+        if self._async_lock_loop is not loop:
+            # asyncio locks belong to one loop; nothing awaits between this check and the swap
+            self._async_lock = asyncio.Lock()
+            self._async_lock_loop = loop
+
+        async with self._async_lock:
+            if self._async_bedrock is not None and self._async_loop is loop:
+                return self._async_bedrock  # Created while this call waited for the lock
+            # aiohttp sessions are tied to the loop that created them, so a client
+            # left behind by a previous (closed) loop is dropped and rebuilt
+            self._exit_stack = AsyncExitStack()
+            client = await self._exit_stack.enter_async_context(
+                self.session.client(service_name='bedrock-runtime', config=self.async_config)
+            )
+            client.meta.events.register("before-send", self._count_async_request)
+            self.stats["clients_created"] += 1
+            self._async_bedrock = client
+            self._async_loop = loop
+            return client
+
+    def index(self, name, api_key=None):
+        """Shared Pinecone index handle with a pooled HTTP connection manager"""
+        if name not in self._indexes:
+            with self._lock:
+                if name not in self._indexes:
+                    pc = Pinecone(api_key=api_key or os.getenv("PINECONE_API_KEY"), pool_threads=self.pool_size)
+                    self._indexes[name] = pc.Index(name, host=pinecone_index_host, connection_pool_maxsize=self.pool_size)
+                    self.stats["clients_created"] += 1
+        return self._indexes[name]
+
+    def _warmup_body(self):
+        return json.dumps({"inputText": "warm up", "dimensions": 1024, "normalize": True})
+
+    def warm_up_sync(self, index_name=None):
+        """Open the sync Bedrock and Pinecone connections before the first real request
+
+        Returns the error message when warm-up failed, else None.
+        """
+        try:
+            self.bedrock().invoke_model(
+                modelId=warmup_model_id,
+                contentType="application/json",
+                accept="*/*",
+                body=self._warmup_body()
+            )['body'].read()
+            if index_name:
+                self.index(index_name).describe_index_stats()
+        except Exception as e:
+            print(f"Client warm-up failed: {str(e)}")
+            return str(e)
+        return None
+
+    async def warm_up(self):
+        """Open the async Bedrock connection pool before the first chunk arrives"""
+        try:
+            bedrock = await self.async_bedrock()
+            response = await bedrock.invoke_model(
+                modelId=warmup_model_id,
+                contentType="application/json",
+                accept="*/*",
+                body=self._warmup_body()
+            )
+            await response['body'].read()
+        except Exception as e:
+            print(f"Async client warm-up failed: {str(e)}")
+
+    async def aclose(self):
+        """Close the async client owned by the running loop"""
+        if self._exit_stack is not None and self._async_loop is asyncio.get_running_loop():
+            await self._exit_stack.aclose()
+        self._exit_stack = None
+        self._async_bedrock = None
+        self._async_loop = None
+
+    def close(self):
+        """Close the sync clients and their connection pools"""
+        with self._lock:
+            if self._bedrock is not None:
+                self._bedrock.close()
+                self._bedrock = None
+            for index in self._indexes.values():
+                try:
+                    index.close()
+                except Exception:
+                    pass
+            self._indexes.clear()
+
+    def connection_stats(self):
+        """Report connection reuse for the sync clients and open connections for the async one
+
+        urllib3 counts every connection it opened, so the sync figures give
+        a reuse ratio. aiohttp only exposes the connections open right now,
+        so the async path reports async_requests against
+        async_connections_open. A healthy pool serves many requests over a
+        handful of connections.
+        """
+        connections = requests = 0
+        if self._bedrock is not None:
+            try:
+                c, r = _urllib3_pool_stats(self._bedrock._endpoint.http_session._manager)
+                connections += c
+                requests += r
+            except AttributeError:
+                pass
+        for index in self._indexes.values():
+            try:
+                c, r = _urllib3_pool_stats(index._vector_api.api_client.rest_client.pool_manager)
+            except AttributeError:
+                continue
+            connections += c
+            requests += r
+
+        stats = dict(self.stats)
+        stats["sync_connections_opened"] = connections
+        stats["sync_requests"] = requests
+        stats["sync_connection_reuse"] = 1 - connections / requests if requests else 0.0
+        stats["async_connections_open"] = (
+            _aiohttp_open_connections(self._async_bedrock) if self._async_bedrock is not None else 0
+        )
+        return stats
+
+
+# Process-wide manager used by both the ingest and query paths
+manager = ClientManager()
+atexit.register(manager.close)
@@ -0,0 +1,2 @@
+# test_streamlit.py is a Streamlit app, not a test module
+collect_ignore = ["test_streamlit.py"]
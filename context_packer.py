@@ -0,0 +1,126 @@
+import os
+import math
+from metrics import increment, record_event
+
+# Context assembly configuration
+context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+mmr_lambda = float(os.getenv("MMR_LAMBDA", "0.7"))
+max_overlap_words = 100
+contiguous_gap = 2.0  # seconds between chunks that still count as one passage
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English)"""
+    return math.ceil(len(text) / 4)
+
+
+def naive_context(matches):
+    """The unpacked "Score/Metadata" context, kept for before/after logging"""
+    return "\n".join(f"Score: {match['score']}, Metadata: {match['metadata']}" for match in matches)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def mmr_order(matches, lambda_=mmr_lambda):
+    """Order matches by maximal marginal relevance over their word sets"""
+    if not matches:
+        return []
+    top = max(match["score"] for match in matches) or 1.0
+    words = [set(match["metadata"].get("chunk", "").lower().split()) for match in matches]
+    remaining = list(range(len(matches)))
+    chosen = []
+    while remaining:
+        def mmr(i):
+            redundancy = max((jaccard(words[i], words[j]) for j in chosen), default=0.0)
+            return lambda_ * matches[i]["score"] / top - (1 - lambda_) * redundancy
+        best = max(remaining, key=mmr)
+        chosen.append(best)
+        remaining.remove(best)
+    return [matches[i] for i in chosen]
+
+
+def overlap_length(left, right):
+    """Longest suffix of left that is also a prefix of right, in words"""
+    for k in range(min(len(left), len(right), max_overlap_words), 0, -1):
+        if left[-k:] == right[:k]:
+            return k
+    return 0
+
+
+def merge_passages(matches):
+    """Sort chunks chronologically and merge neighbours, dropping repeated overlap words"""
+    ordered = sorted(matches, key=lambda m: (
+        m["metadata"].get("event_id", ""),
+        m["metadata"].get("start_offset", m["metadata"].get("start_time", 0)),
+    ))
+    passages = []
+    for match in ordered:
+        meta = match["metadata"]
+        words = meta.get("chunk", "").split()
+        start = meta.get("start_offset")
+        end = meta.get("end_offset")
+        if passages:
+            last = passages[-1]
+            same_event = last["event_id"] == meta.get("event_id", "")
+            k = overlap_length(last["words"], words)
+            touching = (
+                start is not None and last["end"] is not None
+                and start - last["end"] <= contiguous_gap
+            )
+            if same_event and (k or touching):
+                if k == len(words):
+                    continue  # Entirely contained in the previous passage
+                last["words"].extend(words[k:])
+                if end is not None:
+                    last["end"] = max(last["end"] or end, end)
+                continue
+        passages.append({"event_id": meta.get("event_id", ""), "start": start, "end": end, "words": list(words)})
+    return passages
+
+
+def format_offset(seconds):
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def render(passages):
+    return "\n\n".join(
+        f"[{format_offset(p['start'])}-{format_offset(p['end'])}] {' '.join(p['words'])}"
+        for p in passages
+    )
+
+
+def pack_context(matches, budget=context_token_budget):
+    """Build the prompt context from retrieved matches within a token budget
+
+    Chunks are taken in MMR order so near-duplicates are skipped, then merged
+    chronologically with their shared overlap removed. A chunk that would
+    push the packed context past the budget is left out.
+    """
+    selected = []
+    packed = ""
+    for match in mmr_order(matches):
+        candidate = render(merge_passages(selected + [match]))
+        if estimate_tokens(candidate) > budget:
+            if not selected:
+                # Always include something: the best chunk, cut to the budget
+                words = candidate.split()
+                packed = " ".join(words[:max(1, budget * 3 // 4)])
+                selected.append(match)
+            continue
+        selected.append(match)
+        packed = candidate
+
+    before = estimate_tokens(naive_context(matches))
+    after = estimate_tokens(packed)
+    increment("query.context.chunks_packed", len(selected))
+    increment("query.context.tokens_saved", max(0, before - after))
+    record_event("query.context", matches=len(matches), chunks=len(selected), tokens_before=before, tokens_after=after)
+    return packed
@@ -1,12 +1,33 @@
-from pinecone import Pinecone
 import os
+import argparse
+from vector_store import get_vector_store
 
-pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))  # Or replace with your API key directly
-index_name = os.environ.get("PINECONE_INDEX_NAME")
+parser = argparse.ArgumentParser(description="Drop or archive event namespaces in the vector store")
+parser.add_argument("--event", help="namespace (event id) to drop")
+parser.add_argument("--archive", metavar="PATH", help="archive the event's vectors to PATH before dropping it")
+parser.add_argument("--all", action="store_true", help="drop every namespace in the store")
+parser.add_argument("--list", action="store_true", help="list namespaces and their vector counts")
+args = parser.parse_args()
 
-# Connect to the index
-index = pc.Index(index_name)
+# Connect to the configured vector store (VECTOR_STORE=pinecone|local)
+store = get_vector_store(
+    index_name=os.environ.get("PINECONE_INDEX_NAME"),
+    api_key=os.environ.get("PINECONE_API_KEY")  # Or replace with your API key directly
+)
 
-# Delete all vectors
-index.delete(delete_all=True)
-print("All vectors deleted successfully!")
+if args.list:
+    for namespace, count in store.namespace_sizes().items():
+        print(f"{namespace or '(default)'}: {count} vectors")
+elif args.event is not None and args.archive:
+    store.archive_namespace(args.event, args.archive)
+    print(f"Event {args.event} archived to {args.archive}")
+elif args.event is not None:
+    # A single call drops the whole event
+    store.delete_all(namespace=args.event)
+    print(f"Event {args.event} deleted successfully!")
+elif args.all:
+    for namespace in store.namespace_sizes():
+        store.delete_all(namespace=namespace)
+    print("All vectors deleted successfully!")
+else:
+    parser.print_help()
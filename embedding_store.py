@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+
+# Persistent chunk-embedding cache; an empty path disables it
+embedding_store_path = os.getenv("EMBEDDING_STORE_PATH", "embedding_cache.sqlite")
+
+
+class EmbeddingStore:
+    """On-disk embeddings keyed by (model id, content hash)
+
+    Re-ingesting a recording, replaying the chunk log or retrying a batch
+    finds its embeddings here instead of paying for Titan again.
+    """
+
+    def __init__(self, path=embedding_store_path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model_id TEXT NOT NULL, content_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model_id, content_hash))"
+            )
+            self.db.commit()
+
+    def get_many(self, model_id, hashes):
+        """Cached embeddings for the given content hashes, as {hash: list of floats}"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        if self.db is not None and unique:
+            with self.lock:
+                for start in range(0, len(unique), 500):  # Stay under SQLite's parameter limit
+                    part = unique[start:start + 500]
+                    rows = self.db.execute(
+                        f"SELECT content_hash, vector FROM embeddings WHERE model_id = ? "
+                        f"AND content_hash IN ({','.join('?' * len(part))})",
+                        [model_id, *part],
+                    ).fetchall()
+                    for content_hash, blob in rows:
+                        found[content_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model_id, items):
+        """Store (content hash, embedding) pairs in one transaction"""
+        if self.db is None or not items:
+            return
+        rows = [(model_id, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items]
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            self.db.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self):
+        if self.db is not None:
+            with self.lock:
+                self.db.close()
+                self.db = None
@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import time
+import asyncio
+from clients import manager
+from context_packer import overlap_length
+
+# Rolling summary configuration: every summary_every chunks are summarized
+# into a level-0 entry, and summary_fanout entries on a level are folded into
+# one entry on the level above
+summary_every = int(os.getenv("SUMMARY_EVERY_CHUNKS", "5"))
+summary_fanout = int(os.getenv("SUMMARY_FANOUT", "4"))
+summary_max_tokens = int(os.getenv("SUMMARY_MAX_TOKENS", "400"))
+summary_model_id = os.getenv("SUMMARY_MODEL_ID") or os.getenv("MODEL_ID")
+summary_dir = os.getenv("SUMMARY_DIR", "summaries")
+
+overview_pattern = re.compile(
+    r"\b(summar\w*|overview|recap|gist|main points|key points|key takeaways|highlights|so far|"
+    r"what (?:was|is) (?:the|this) (?:talk|event|session) about)\b",
+    re.IGNORECASE
+)
+
+summarize_transcript = (
+    "Summarize this part of a live talk transcript in a few concise bullet points. "
+    "Keep names, figures and decisions exactly as stated."
+)
+summarize_summaries = (
+    "These are consecutive summaries of a live talk, oldest first. Merge them into one "
+    "concise bullet-point summary of the whole span, keeping names, figures and decisions."
+)
+
+
+def is_overview_question(query):
+    """True for questions about the event as a whole, like "summarize the talk so far" """
+    return overview_pattern.search(query) is not None
+
+
+def summary_path(event_id):
+    return os.path.join(summary_dir, f"{event_id or '__default__'}.json")
+
+
+def load_summary(event_id):
+    """Published summary of an event, or None before the first update"""
+    try:
+        with open(summary_path(event_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class RollingSummary:
+    """Hierarchical summary of an event, updated in the background during ingestion
+
+    Chunk text (minus the overlap it shares with the previous chunk) is
+    collected until summary_every chunks have arrived, then summarized into a
+    level-0 entry. A level that reaches summary_fanout entries is folded into
+    a single entry on the next level, so an update summarizes at most
+    max(summary_every chunks, summary_fanout entries) and the published
+    summary never holds more than summary_fanout - 1 entries per level.
+    """
+
+    def __init__(self, event_id, every=summary_every, fanout=summary_fanout, model_id=summary_model_id):
+        self.event_id = event_id
+        self.every = every
+        self.fanout = max(2, fanout)
+        self.model_id = model_id
+        self.levels = [[]]
+        self.pending = []  # new text of chunks not summarized yet
+        self.previous_words = []
+        self.queue = asyncio.Queue()
+        self.task = None
+        self.chunks_summarized = 0
+        self.updates = 0
+
+    def add_chunk(self, text):
+        """Record a chunk; a full block is handed to the background summarizer"""
+        if not self.model_id:
+            return
+        words = text.split()
+        new_words = words[overlap_length(self.previous_words, words):]
+        self.previous_words = words
+        if new_words:
+            self.pending.append(" ".join(new_words))
+        if len(self.pending) >= self.every:
+            self.enqueue()
+
+    def enqueue(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+        self.queue.put_nowait(self.pending)
+        self.pending = []
+
+    async def run(self):
+        while True:
+            block = await self.queue.get()
+            if block is None:
+                return
+            try:
+                entry = await self.summarize(summarize_transcript, block)
+                await self.push(0, entry)
+                self.chunks_summarized += len(block)
+                self.publish()
+            except Exception as e:
+                print(f"Summary update failed, skipping {len(block)} chunks: {str(e)}")
+
+    async def push(self, level, entry):
+        if level == len(self.levels):
+            self.levels.append([])
+        self.levels[level].append(entry)
+        if len(self.levels[level]) >= self.fanout:
+            folded = await self.summarize(summarize_summaries, self.levels[level])
+            self.levels[level] = []
+            await self.push(level + 1, folded)
+
+    async def summarize(self, instruction, texts):
+        bedrock = await manager.async_bedrock()
+        response = await bedrock.converse(
+            modelId=self.model_id,
+            system=[{"text": instruction}],
+            messages=[{"role": "user", "content": [{"text": "\n\n".join(texts)}]}],
+            inferenceConfig={"maxTokens": summary_max_tokens, "temperature": 0},
+        )
+        self.updates += 1
+        return response['output']['message']['content'][0]['text']
+
+    def text(self):
+        """Entries oldest first: higher levels cover earlier parts of the talk"""
+        return "\n\n".join(entry for level in reversed(self.levels) for entry in level)
+
+    def publish(self):
+        """Atomically write the summary where the query process can read it"""
+        os.makedirs(summary_dir, exist_ok=True)
+        path = summary_path(self.event_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "event_id": self.event_id,
+                "updated_at": time.time(),
+                "chunks": self.chunks_summarized,
+                "text": self.text(),
+            }, f)
+        os.replace(tmp_path, path)
+        print(f"[Summary] {self.chunks_summarized} chunks, {self.updates} model calls")
+
+    async def close(self):
+        """Summarize the remaining chunks and wait for the summarizer to finish"""
+        if self.pending:
+            self.enqueue()
+        if self.task is not None:
+            self.queue.put_nowait(None)
+            await self.task
+            self.task = None  # A later chunk starts a new summarizer, e.g. the next file of a bulk run
@@ -0,0 +1,33 @@
+import os
+from datetime import datetime
+
+# The active event decides which vector-store namespace ingestion writes to
+# and queries read from. Ingestion publishes it to a small file so a query
+# process started separately picks up the same event.
+active_event_path = os.getenv("ACTIVE_EVENT_FILE", ".active_event")
+
+_current_event = os.getenv("EVENT_ID")
+
+
+def start_event(event_id=None):
+    """Choose the namespace for a new ingestion session and publish it"""
+    global _current_event
+    event_id = event_id or os.getenv("EVENT_ID") or datetime.now().strftime("event-%Y%m%d-%H%M%S")
+    tmp_path = active_event_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(event_id)
+    os.replace(tmp_path, active_event_path)
+    _current_event = event_id
+    print(f"[Event] Ingesting into namespace {event_id}")
+    return event_id
+
+
+def current_event():
+    """Namespace of the active event; "" (the default namespace) when none was started"""
+    if _current_event:
+        return _current_event
+    try:
+        with open(active_event_path) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
@@ -0,0 +1,128 @@
+"""Deterministic local stand-ins for the AWS clients, for offline checks"""
+import json
+import time
+import asyncio
+import hashlib
+import threading
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class FakeBedrock:
+    """Stub bedrock-runtime client with converse/converse_stream and prompt caching
+
+    A system prompt that ends in a cachePoint block is "written" to the cache
+    on first use and "read" from it by later requests with the same prefix,
+    and the returned usage blocks report that split the way Bedrock does.
+    Like Bedrock, a prefix shorter than cache_min_tokens is not cached.
+    """
+
+    def __init__(self, answer="This is a stub answer.", latency=0.0, embed_latency=0.0, cache_min_tokens=1024):
+        self.answer = answer
+        self.cache_min_tokens = cache_min_tokens
+        self.latency = latency  # seconds per converse call
+        self.embed_latency = embed_latency  # seconds per embedding
+        self.cached_prefixes = set()
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _usage(self, system, messages):
+        prefix, cacheable = [], False
+        for block in system or []:
+            if "cachePoint" in block:
+                cacheable = True
+                break
+            prefix.append(block.get("text", ""))
+        prefix_text = "".join(prefix) if cacheable else ""
+        if estimate_tokens(prefix_text) < self.cache_min_tokens:
+            prefix_text = ""  # Too short to cache; billed as ordinary input
+        rest = "".join(block.get("text", "") for block in (system or []) if "text" in block)[len(prefix_text):]
+        rest += "".join(part.get("text", "") for message in messages for part in message["content"])
+
+        usage = {"inputTokens": estimate_tokens(rest), "cacheReadInputTokens": 0, "cacheWriteInputTokens": 0}
+        if prefix_text:
+            key = hashlib.sha1(prefix_text.encode()).hexdigest()
+            with self.lock:
+                hit = key in self.cached_prefixes
+                self.cached_prefixes.add(key)
+            usage["cacheReadInputTokens" if hit else "cacheWriteInputTokens"] = estimate_tokens(prefix_text)
+        usage["outputTokens"] = estimate_tokens(self.answer)
+        usage["totalTokens"] = sum(usage.values())
+        return usage
+
+    def converse(self, modelId, messages, system=None, inferenceConfig=None, **kwargs):
+        self.calls.append({"modelId": modelId, "system": system, "messages": messages})
+        time.sleep(self.latency)
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": self.answer}]}},
+            "usage": self._usage(system, messages),
+            "stopReason": "end_turn",
+        }
+
+    def converse_stream(self, modelId, messages, system=None, inferenceConfig=None, **kwargs):
+        self.calls.append({"modelId": modelId, "system": system, "messages": messages})
+        usage = self._usage(system, messages)
+
+        def events():
+            time.sleep(self.latency)
+            yield {"messageStart": {"role": "assistant"}}
+            for word in self.answer.split(" "):
+                yield {"contentBlockDelta": {"delta": {"text": word + " "}, "contentBlockIndex": 0}}
+            yield {"messageStop": {"stopReason": "end_turn"}}
+            yield {"metadata": {"usage": usage}}
+
+        return {"stream": events()}
+
+    def invoke_model(self, modelId, body, **kwargs):
+        """Titan-style embedding: a deterministic unit vector derived from the text"""
+        text = json.loads(body)["inputText"]
+        time.sleep(self.embed_latency)
+        return {"body": _Body(json.dumps({"embedding": fake_embedding(text)}).encode())}
+
+    def close(self):
+        pass
+
+
+class FakeAsyncBedrock:
+    """Async counterpart used by the ingest path: embeddings and converse with fixed latency"""
+
+    def __init__(self, embed_latency=0.05, latency=0.2, answer="- Stub summary point."):
+        self.embed_latency = embed_latency
+        self.latency = latency
+        self.answer = answer
+        self.embeddings = 0
+
+    async def invoke_model(self, modelId, body, **kwargs):
+        text = json.loads(body)["inputText"]
+        await asyncio.sleep(self.embed_latency)
+        self.embeddings += 1
+        return {"body": _AsyncBody(json.dumps({"embedding": fake_embedding(text)}).encode())}
+
+    async def converse(self, modelId, messages, system=None, inferenceConfig=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return {"output": {"message": {"role": "assistant", "content": [{"text": self.answer}]}}}
+
+
+class _Body:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class _AsyncBody(_Body):
+    async def read(self):
+        return self.data
+
+
+def fake_embedding(text, dim=1024):
+    """Deterministic normalized embedding; texts sharing words get similar vectors"""
+    vector = [0.0] * dim
+    for word in text.lower().split():
+        digest = hashlib.md5(word.encode()).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
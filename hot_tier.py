@@ -0,0 +1,114 @@
+import os
+import time
+import threading
+import numpy as np
+
+# Hot window configuration
+hot_capacity = int(os.getenv("HOT_TIER_CAPACITY", "512"))
+hot_max_age = float(os.getenv("HOT_TIER_MAX_AGE", "900"))  # seconds
+dimension = 1024
+
+
+class HotTier:
+    """Bounded in-process ring buffer of the most recently embedded chunks"""
+
+    def __init__(self, capacity=hot_capacity, dim=dimension, max_age=hot_max_age):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.added_at = np.zeros(capacity, dtype=np.float64)
+        self.spoken_at = np.zeros(capacity, dtype=np.float64)  # chunk end_time, for time windows
+        self.valid = np.zeros(capacity, dtype=bool)
+        self.ids = [None] * capacity
+        self.metadata = [None] * capacity
+        self.slots = {}  # chunk id -> ring slot
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return int(self.valid.sum())
+
+    def add(self, chunk_id, vector, metadata):
+        """Insert or refresh a chunk; the oldest slot is overwritten when full"""
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return
+        with self.lock:
+            slot = self.slots.get(chunk_id)
+            if slot is None:
+                slot = self.next_slot
+                self.next_slot = (self.next_slot + 1) % self.capacity
+                evicted = self.ids[slot]
+                if evicted is not None:
+                    self.slots.pop(evicted, None)
+                self.slots[chunk_id] = slot
+            self.vectors[slot] = vec / norm
+            self.added_at[slot] = time.time()
+            self.spoken_at[slot] = (metadata or {}).get("end_time", self.added_at[slot])
+            self.valid[slot] = True
+            self.ids[slot] = chunk_id
+            self.metadata[slot] = metadata
+
+    def remove(self, chunk_id):
+        """Drop a chunk, e.g. a provisional one that has been superseded"""
+        with self.lock:
+            slot = self.slots.pop(chunk_id, None)
+            if slot is not None:
+                self.valid[slot] = False
+                self.ids[slot] = None
+                self.metadata[slot] = None
+
+    def evict_expired(self, now=None):
+        """Drop chunks older than max_age seconds"""
+        now = time.time() if now is None else now
+        with self.lock:
+            expired = np.flatnonzero(self.valid & (self.added_at < now - self.max_age))
+            for slot in expired:
+                self.slots.pop(self.ids[slot], None)
+                self.ids[slot] = None
+                self.metadata[slot] = None
+            self.valid[expired] = False
+
+    def search(self, vector, top_k=3, since=None, namespace=None):
+        """Cosine top-k over the live window, shaped like Pinecone matches
+
+        since limits the search to chunks whose speech ended at or after that
+        epoch time. namespace, when given, keeps only chunks of that event.
+        """
+        self.evict_expired()
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        with self.lock:
+            mask = self.valid if since is None else self.valid & (self.spoken_at >= since)
+            live = np.flatnonzero(mask)
+            if namespace is not None:
+                keep = [(self.metadata[slot] or {}).get("event_id", "") == namespace for slot in live]
+                live = live[np.array(keep, dtype=bool)]
+            if live.size == 0:
+                return []
+            scores = self.vectors[live] @ (query / norm)
+            k = min(top_k, live.size)
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [
+                {"id": self.ids[live[i]], "score": float(scores[i]), "metadata": self.metadata[live[i]]}
+                for i in best
+            ]
+
+
+def merge_matches(*match_lists, top_k=3):
+    """Merge match lists from several tiers, keeping the best score per chunk id"""
+    best = {}
+    for matches in match_lists:
+        for match in matches:
+            current = best.get(match["id"])
+            if current is None or match["score"] > current["score"]:
+                best[match["id"]] = match
+    return sorted(best.values(), key=lambda m: m["score"], reverse=True)[:top_k]
+
+
+# Process-wide hot window filled by ragEmbed and searched by the query path
+hot_window = HotTier()
@@ -0,0 +1,193 @@
+import os
+import time
+import asyncio
+from collections import deque
+
+# Worker pool configuration; keep workers >= EMBED_BATCH_SIZE so batches can fill
+ingest_workers = int(os.getenv("INGEST_WORKERS", "32"))
+ingest_queue_size = int(os.getenv("INGEST_QUEUE_SIZE", "128"))
+
+
+class IngestWorkerPool:
+    """Fixed-size pool of ingestion workers fed by a bounded work queue
+
+    submit() waits while the queue is full, which pushes backpressure back to
+    the caller instead of piling up untracked tasks. drain() waits for queued
+    and in-flight work before stopping the workers.
+    """
+
+    def __init__(self, handler, workers=ingest_workers, queue_size=ingest_queue_size):
+        self.handler = handler
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.tasks = []
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.started_at = None
+
+    def start(self):
+        if self.tasks:
+            return
+        self.started_at = time.perf_counter()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, *item):
+        """Queue one unit of work, waiting for space if the pool is saturated"""
+        self.start()
+        await self.queue.put(item)
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            self.in_flight += 1
+            try:
+                await self.handler(*item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Ingest worker error: {str(e)}")
+            finally:
+                self.in_flight -= 1
+                self.queue.task_done()
+
+    async def drain(self):
+        """Finish all queued and in-flight work, then stop the workers"""
+        if not self.tasks:
+            return
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def metrics(self):
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "throughput_per_s": self.processed / elapsed if elapsed else 0.0,
+        }
+
+
+class IngestLane:
+    """One stream's bounded queue on a FairIngestScheduler
+
+    It has the same submit/drain/metrics interface as IngestWorkerPool, so a
+    handler uses either without knowing whether its workers are shared.
+    """
+
+    def __init__(self, scheduler, name, handler, queue_size):
+        self.scheduler = scheduler
+        self.name = name
+        self.handler = handler
+        self.items = deque()
+        self.space = asyncio.Semaphore(queue_size)
+        self.unfinished = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.started_at = None
+
+    async def submit(self, *item):
+        """Queue one unit of work, waiting for space if this lane is full"""
+        self.scheduler.start()
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        await self.space.acquire()
+        self.items.append(item)
+        self.unfinished += 1
+        self.idle.clear()
+        self.scheduler.ready.release()
+
+    def task_done(self):
+        self.unfinished -= 1
+        if self.unfinished == 0:
+            self.idle.set()
+
+    async def drain(self):
+        """Wait until this lane's queued and in-flight work is done; the shared workers keep running"""
+        await self.idle.wait()
+
+    def metrics(self):
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        return {
+            "lane": self.name,
+            "workers": self.scheduler.workers,
+            "queue_depth": len(self.items),
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "throughput_per_s": self.processed / elapsed if elapsed else 0.0,
+        }
+
+
+class FairIngestScheduler:
+    """Ingestion workers shared by several streams and served round-robin
+
+    Each stream submits to its own bounded lane. A free worker takes the
+    oldest item of the next non-empty lane in turn, so a stream with a
+    backlog gets at most its share of the workers (and of each embedding
+    batch) while the other streams keep flowing.
+    """
+
+    def __init__(self, workers=ingest_workers, queue_size=ingest_queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.lanes = {}
+        self.rotation = deque()  # lane names in round-robin order
+        self.ready = asyncio.Semaphore(0)  # one permit per queued item across all lanes
+        self.tasks = []
+
+    def lane(self, name, handler):
+        if name in self.lanes:
+            raise ValueError(f"Lane {name!r} already exists")
+        lane = IngestLane(self, name, handler, self.queue_size)
+        self.lanes[name] = lane
+        self.rotation.append(name)
+        return lane
+
+    def start(self):
+        if self.tasks:
+            return
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _next_lane(self):
+        while True:
+            name = self.rotation[0]
+            self.rotation.rotate(-1)
+            if self.lanes[name].items:
+                return self.lanes[name]
+
+    async def _worker(self):
+        while True:
+            await self.ready.acquire()
+            lane = self._next_lane()
+            item = lane.items.popleft()
+            lane.space.release()
+            lane.in_flight += 1
+            try:
+                await lane.handler(*item)
+                lane.processed += 1
+            except Exception as e:
+                lane.failed += 1
+                print(f"Ingest worker error ({lane.name}): {str(e)}")
+            finally:
+                lane.in_flight -= 1
+                lane.task_done()
+
+    async def drain(self):
+        """Finish the work of every lane, then stop the workers"""
+        await asyncio.gather(*(lane.drain() for lane in self.lanes.values()))
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def metrics(self):
+        return {name: lane.metrics() for name, lane in self.lanes.items()}
@@ -0,0 +1,206 @@
+"""Long-running transcription/ingestion service with start, stop and status controls
+
+Usage:
+    python ingest_service.py                 # control API on 127.0.0.1:8765
+    python ingest_service.py --port 9000
+
+    curl -X POST 'http://127.0.0.1:8765/start?event=keynote'
+    curl http://127.0.0.1:8765/status
+    curl -X POST http://127.0.0.1:8765/stop
+    curl http://127.0.0.1:8765/metrics       # latency/freshness percentiles and counters
+
+The Streamlit app either talks to a standalone service through IngestClient
+(when INGEST_SERVICE_URL is set) or runs an IngestionService in its own
+process; both expose the same start/stop/status calls.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from metrics import snapshot, counter_snapshot, events_snapshot
+
+service_url = os.getenv("INGEST_SERVICE_URL")
+
+
+class IngestionService:
+    """Runs basic_transcribe on a dedicated event-loop thread
+
+    Commands are thread-safe and return immediately; stop() cancels the
+    session, which flushes the last chunk and drains pending upserts before
+    the session reports "stopped".
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="ingest-loop", daemon=True)
+        self.thread.start()
+        self.session = None  # asyncio task of the running session, owned by the loop
+        self.done = threading.Event()
+        self.done.set()
+        self.handler = None
+        self.state = "idle"
+        self.event_id = None
+        self.started_at = None
+        self.stopped_at = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def start(self, event_id=None):
+        with self.lock:
+            if self.state in ("starting", "running", "stopping"):
+                return self.status()
+            self.state = "starting"
+            self.event_id = event_id
+            self.handler = None
+            self.error = None
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.done.clear()
+            self.loop.call_soon_threadsafe(self._spawn, event_id)
+        return self.status()
+
+    def _spawn(self, event_id):
+        self.session = self.loop.create_task(self._run(event_id))
+
+    async def _run(self, event_id):
+        def attach(handler):
+            self.handler = handler
+            self.event_id = handler.event_id
+            if self.state == "starting":
+                self.state = "running"
+
+        try:
+            from main import basic_transcribe  # Deferred: pulls in the audio and ingest stack
+            await basic_transcribe(event_id, on_handler=attach)
+            self.state = "stopped"
+        except asyncio.CancelledError:
+            self.state = "stopped"
+        except Exception as e:
+            print(f"Ingestion failed: {str(e)}")
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            self.stopped_at = time.time()
+            self.done.set()
+
+    def stop(self):
+        with self.lock:
+            if self.state in ("starting", "running"):
+                self.state = "stopping"
+                self.loop.call_soon_threadsafe(self._cancel)
+        return self.status()
+
+    def _cancel(self):
+        if self.session is not None and not self.session.done():
+            self.session.cancel()
+
+    def join(self, timeout=None):
+        """Wait for the current session to finish flushing; True once it has"""
+        return self.done.wait(timeout)
+
+    def status(self):
+        status = {
+            "state": self.state,
+            "event_id": self.event_id,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "uptime_seconds": None if self.started_at is None else (self.stopped_at or time.time()) - self.started_at,
+            "error": self.error,
+        }
+        if self.handler is not None:
+            status.update(self.handler.status())
+        return status
+
+    def metrics(self):
+        return {"histograms": snapshot(), "counters": counter_snapshot(), "events": events_snapshot()}
+
+
+class IngestClient:
+    """Same start/stop/status calls, sent to a standalone service over HTTP"""
+
+    def __init__(self, url=service_url, timeout=5):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, method, path, **params):
+        query = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        request = urllib.request.Request(f"{self.url}{path}{'?' + query if query else ''}", method=method)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def start(self, event_id=None):
+        return self._call("POST", "/start", event=event_id)
+
+    def stop(self):
+        return self._call("POST", "/stop")
+
+    def status(self):
+        return self._call("GET", "/status")
+
+    def metrics(self):
+        return self._call("GET", "/metrics")
+
+
+def serve(service, host="127.0.0.1", port=8765):
+    """Expose a service's controls as a small local JSON API"""
+
+    class ControlHandler(BaseHTTPRequestHandler):
+        def _reply(self, body, code=200):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urllib.parse.urlparse(self.path).path
+            if path == "/status":
+                self._reply(service.status())
+            elif path == "/metrics":
+                self._reply(service.metrics())
+            else:
+                self._reply({"error": "not found"}, 404)
+
+        def do_POST(self):
+            url = urllib.parse.urlparse(self.path)
+            params = urllib.parse.parse_qs(url.query)
+            if url.path == "/start":
+                self._reply(service.start(params.get("event", [None])[0]))
+            elif url.path == "/stop":
+                self._reply(service.stop())
+            else:
+                self._reply({"error": "not found"}, 404)
+
+        def log_message(self, format, *args):
+            pass  # Status is polled every few seconds; keep the console for ingest output
+
+    server = ThreadingHTTPServer((host, port), ControlHandler)
+    print(f"[Ingest Service] Listening on http://{host}:{port}")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--start", action="store_true", help="start a session immediately")
+    args = parser.parse_args()
+
+    service = IngestionService()
+    if args.start:
+        service.start()
+    server = serve(service, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping ingestion...")
+    finally:
+        service.stop()
+        service.join(timeout=60)
+        server.server_close()
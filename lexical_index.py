@@ -0,0 +1,169 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from chunk_log import chunk_log_path, read_generation
+
+# The index keeps the most recent lexical_max_docs chunks. A query process
+# follows the ingest process's chunk log to see its chunks (0 disables).
+lexical_max_docs = int(os.getenv("LEXICAL_MAX_DOCS", "50000"))
+lexical_follow_log = os.getenv("LEXICAL_FOLLOW_LOG", "1") == "1"
+
+# Keeps acronyms, numbers like 3.5 and contractions as single terms
+token_pattern = re.compile(r"[a-z0-9]+(?:['.][a-z0-9]+)*")
+
+
+def tokenize(text):
+    return token_pattern.findall(text.lower())
+
+
+class BM25Index:
+    """Incremental in-memory BM25 inverted index over transcript chunks
+
+    Once max_docs chunks are indexed, adding one evicts the oldest.
+    """
+
+    def __init__(self, k1=1.5, b=0.75, max_docs=lexical_max_docs):
+        self.k1 = k1
+        self.b = b
+        self.max_docs = max_docs
+        self.order = OrderedDict()  # doc ids, oldest first
+        self.postings = defaultdict(dict)  # term -> {doc id: term frequency}
+        self.doc_lengths = {}
+        self.doc_terms = {}  # doc id -> its distinct terms, for cheap removal
+        self.metadata = {}
+        self.total_length = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text, metadata=None):
+        """Index a chunk; re-adding an id replaces its previous postings"""
+        terms = Counter(tokenize(text))
+        with self.lock:
+            self._remove(doc_id)
+            for term, tf in terms.items():
+                self.postings[term][doc_id] = tf
+            length = sum(terms.values())
+            self.doc_lengths[doc_id] = length
+            self.doc_terms[doc_id] = list(terms)
+            self.total_length += length
+            self.metadata[doc_id] = metadata if metadata is not None else {"chunk": text}
+            self.order[doc_id] = True
+            while self.max_docs and len(self.order) > self.max_docs:
+                self._remove(next(iter(self.order)))
+
+    def remove(self, doc_id):
+        with self.lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        self.metadata.pop(doc_id, None)
+        self.order.pop(doc_id, None)
+        for term in self.doc_terms.pop(doc_id):
+            del self.postings[term][doc_id]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def search(self, query, top_k=3, since=None, namespace=None):
+        """Top-k chunks by BM25 score, shaped like vector-store matches
+
+        since skips chunks whose speech ended before that epoch time, and
+        namespace, when given, skips chunks of other events.
+        """
+        terms = set(tokenize(query))
+        with self.lock:
+            n = len(self.doc_lengths)
+            if n == 0 or not terms:
+                return []
+            avg_length = self.total_length / n
+            scores = defaultdict(float)
+            for term in terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    metadata = self.metadata[doc_id]
+                    if since is not None and metadata.get("end_time", since) < since:
+                        continue
+                    if namespace is not None and metadata.get("event_id", "") != namespace:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [{"id": doc_id, "score": score, "metadata": self.metadata[doc_id]} for doc_id, score in best]
+
+
+def reciprocal_rank_fusion(*match_lists, k=60, top_k=3):
+    """Fuse ranked match lists by summing 1 / (k + rank) per chunk id"""
+    fused = {}
+    for matches in match_lists:
+        for rank, match in enumerate(matches, start=1):
+            entry = fused.setdefault(match["id"], {"id": match["id"], "score": 0.0, "metadata": match["metadata"]})
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda m: m["score"], reverse=True)[:top_k]
+
+
+class ChunkLogFollower:
+    """Adds chunks that another process appends to the chunk log to an index
+
+    The Streamlit apps run apart from ingestion (main.py, ingest_service.py,
+    multi_stream.py), so their own index would stay empty. poll() reads the
+    lines added since the last call. When the log has been compacted (its
+    generation changed) or replaced by a new file, it starts again from
+    the top, and re-adding an id is harmless. Chunks
+    from bulk_ingest.py, which does not write a chunk log, are not seen.
+    """
+
+    def __init__(self, index, path=chunk_log_path):
+        self.index = index
+        self.path = path
+        self.offset = 0
+        self.generation = None
+        self.file_id = None  # (st_dev, st_ino) of the log being read
+        self.lock = threading.Lock()
+
+    def poll(self):
+        """Index newly logged chunks; returns how many were added"""
+        with self.lock:
+            generation = read_generation(self.path)
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return 0
+            size = stat.st_size
+            file_id = (stat.st_dev, stat.st_ino)
+            if generation != self.generation or file_id != self.file_id or size < self.offset:
+                self.offset = 0  # Compacted or replaced since the last poll
+                self.generation = generation
+                self.file_id = file_id
+            if size == self.offset:
+                return 0
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read(size - self.offset)
+            complete = data[:data.rfind(b"\n") + 1]  # A torn last line is read again next time
+            self.offset += len(complete)
+            added = 0
+            for line in complete.splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.index.add(record["id"], record["chunk"], {"chunk": record["chunk"], **record["metadata"]})
+                added += 1
+            return added
+
+
+# Process-wide index fed by MyEventHandler.store_chunk in the ingest process
+# and by the chunk-log follower in a query process
+lexical_index = BM25Index()
+chunk_log_follower = ChunkLogFollower(lexical_index)
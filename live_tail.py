@@ -0,0 +1,102 @@
+import os
+import re
+import json
+import time
+from context_packer import format_offset
+
+# The newest words that are not in a chunk yet, published by the ingest
+# process for the query process; tails older than live_tail_max_age seconds
+# are from a session that has stopped and are ignored
+live_tail_words = int(os.getenv("LIVE_TAIL_WORDS", "60"))
+live_tail_interval = float(os.getenv("LIVE_TAIL_INTERVAL", "0.5"))
+live_tail_max_age = float(os.getenv("LIVE_TAIL_MAX_AGE", "60"))
+live_tail_heartbeat = float(os.getenv("LIVE_TAIL_HEARTBEAT", "5"))  # rewrite an unchanged tail this often
+live_tail_dir = os.getenv("LIVE_TAIL_DIR", "live_tail")
+
+live_pattern = re.compile(
+    r"\b(just (?:said|say|mentioned|talked about|asked|announced)|right now|at the moment|"
+    r"currently (?:saying|talking about|discussing)|last (?:sentence|thing said|few words)|"
+    r"(?:is|are) (?:he|she|they|the speakers?) (?:saying|talking about|discussing))\b",
+    re.IGNORECASE
+)
+
+
+def is_live_question(query):
+    """True for questions about what is being said right now, like "what did the speaker just say" """
+    return live_pattern.search(query) is not None
+
+
+def tail_path(event_id):
+    return os.path.join(live_tail_dir, f"{event_id or '__default__'}.json")
+
+
+def load_tail(event_id, max_age=live_tail_max_age):
+    """Published live tail of an event, or None when there is no recent one"""
+    try:
+        with open(tail_path(event_id)) as f:
+            tail = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if time.time() - tail["written_at"] > max_age or not tail["words"]:
+        return None
+    return tail
+
+
+def render_tail(tail):
+    """The tail as one "[mm:ss-mm:ss] text" passage, like packed context"""
+    if not tail or not tail["words"]:
+        return ""
+    words = tail["words"]
+    return f"[{format_offset(words[0][1])}-{format_offset(words[-1][2])}] {' '.join(w[0] for w in words)}"
+
+
+class LiveTail:
+    """Publishes the un-chunked end of a transcript, at most once per interval
+
+    The tail is the last `words` words that have not reached a chunk:
+    committed pending words followed by the still-unstable words of the
+    current partial result, each as [text, start offset, end offset, stable].
+    An unchanged tail is rewritten every `heartbeat` seconds, which keeps
+    its written_at fresh through pauses in the speech.
+    """
+
+    def __init__(self, event_id, words=live_tail_words, interval=live_tail_interval, heartbeat=live_tail_heartbeat):
+        self.event_id = event_id
+        self.words = words
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.published_at = 0.0
+        self.published_words = None
+        self.publishes = 0
+
+    def update(self, chunker, force=False):
+        if self.words <= 0:
+            return
+        now = time.monotonic()
+        if not force and now - self.published_at < self.interval:
+            return
+        words = chunker.tail(self.words)
+        if words == self.published_words and now - self.published_at < self.heartbeat:
+            return  # Unchanged; rewritten on the heartbeat so readers can tell the session is alive
+        try:
+            self.publish(words, chunker.stream_started_at)
+        except OSError as e:
+            print(f"Failed to publish live tail: {str(e)}")
+            return
+        self.published_at = now
+        self.published_words = words
+
+    def publish(self, words, stream_started_at):
+        """Atomically write the tail where the query process can read it"""
+        os.makedirs(live_tail_dir, exist_ok=True)
+        path = tail_path(self.event_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "event_id": self.event_id,
+                "written_at": time.time(),
+                "stream_started_at": stream_started_at,
+                "words": [list(word) for word in words],
+            }, f)
+        os.replace(tmp_path, path)
+        self.publishes += 1
@@ -1,120 +1,332 @@
 import asyncio
-import sounddevice
+import os
+import sys
+import time
+import uuid
 from amazon_transcribe.client import TranscribeStreamingClient
 from amazon_transcribe.handlers import TranscriptResultStreamHandler
 from amazon_transcribe.model import TranscriptEvent
-from asyncio import Semaphore
-from ragEmbed import async_update_db
+from ragEmbed import async_update_db, delete_chunks, warm_up, shutdown
+from lexical_index import lexical_index
+from chunker import TranscriptChunker, chunk_id as make_chunk_id, provisional_chunk_id
+from audio_buffer import AudioFrameRing
+from chunk_log import ChunkLog
+from ingest_pool import IngestWorkerPool
+from events import start_event, current_event
+from event_summary import RollingSummary
+from live_tail import LiveTail
+from metrics import observe_freshness, start_periodic_dump
+
+# Chunk flushing: pending words older than max_staleness seconds are published
+# as a provisional chunk (0 disables), and chunk size follows the speech rate so
+# a chunk covers about chunk_target_seconds of audio
+max_staleness = float(os.getenv("CHUNK_MAX_STALENESS", "20"))
+chunk_target_seconds = float(os.getenv("CHUNK_TARGET_SECONDS", "75"))
+chunk_min_words = int(os.getenv("CHUNK_MIN_WORDS", "100"))
+chunk_max_words = int(os.getenv("CHUNK_MAX_WORDS", "200"))
 
 class MyEventHandler(TranscriptResultStreamHandler):
-    def __init__(self, output_stream):
+    def __init__(self, output_stream, chunk_log=None, event_id=None, scheduler=None, summary=None, live_tail=None,
+                 max_staleness=max_staleness):
         super().__init__(output_stream)
-        self.current_words = []
-        self.chunk_size = 200
-        self.overlap_size = 70
-        self.previous_chunk_end = []
-        self.last_transcript = ""
-        self.upsert_sem = Semaphore(5)
-        
+        self.chunk_log = chunk_log
+        self.event_id = event_id if event_id is not None else current_event()
+        self.max_staleness = max_staleness  # 0 for sources that are not live, like recorded files
+        self.session = uuid.uuid4().hex[:8]  # Keeps provisional ids apart from other handlers of the event
+        self.chunker = TranscriptChunker(
+            chunk_size=chunk_max_words, overlap_size=70, stream_started_at=time.time(),
+            target_seconds=chunk_target_seconds, min_size=chunk_min_words, max_size=chunk_max_words,
+        )
+        if scheduler is not None:
+            # Embedding and upserts are shared with the other streams of a supervisor
+            self.pool = scheduler.lane(self.event_id, self.upsert_to_vector_db)
+        else:
+            self.pool = IngestWorkerPool(self.upsert_to_vector_db)
+        # Handlers that share an event pass in one summary, or disabled ones, so
+        # they don't overwrite each other's published files
+        self.summary = summary if summary is not None else RollingSummary(self.event_id)
+        self.live_tail = live_tail if live_tail is not None else LiveTail(self.event_id)
+        self.chunks_emitted = 0
+        self.chunks_upserted = 0
+        self.last_emitted_end = None  # epoch end_time of the newest chunk emitted
+        self.last_upserted_end = None  # epoch end_time of the newest chunk upserted
+        self.provisional_tasks = {}  # position -> upsert task of its provisional chunk
+        self.provisional_key = None  # (position, words seen) of the last provisional chunk
+        self.watcher = None
+
+    @property
+    def current_words(self):
+        """Committed words that have not reached a chunk yet"""
+        return self.chunker.pending
+
+    def lag(self):
+        """Seconds of committed speech not yet searchable in the vector store"""
+        if self.current_words:
+            newest = self.chunker.stream_started_at + self.current_words[-1][2]
+        else:
+            newest = self.last_emitted_end
+        if newest is None:
+            return None
+        return max(0.0, newest - (self.last_upserted_end or self.chunker.stream_started_at))
+
+    def status(self):
+        return {
+            "event_id": self.event_id,
+            "chunks_emitted": self.chunks_emitted,
+            "chunks_upserted": self.chunks_upserted,
+            "words_pending": len(self.current_words),
+            "lag_seconds": self.lag(),
+            "pool": self.pool.metrics(),
+        }
+
     async def handle_transcript_event(self, transcript_event: TranscriptEvent):
+        if self.watcher is None:
+            self.watcher = asyncio.create_task(self.watch_buffer())
         results = transcript_event.transcript.results
         for result in results:
-            for alt in result.alternatives:
-                new_text = alt.transcript
-                
-                # Prevent repeating previous words
-                if new_text.startswith(self.last_transcript):
-                    new_text = new_text[len(self.last_transcript):].strip()
-                
-                new_words = new_text.split()
-                if new_words:
-                    self.current_words.extend(new_words)
-                    print("[Streaming]:", new_text)  # Print streaming text
-                    self.last_transcript = alt.transcript  # Update last seen transcript
-                
-                if len(self.current_words) >= self.chunk_size:
-                    await self.store_chunk()  # <-- Fix: Added `await`
-    
-    async def store_chunk(self):
-        if len(self.current_words) < self.chunk_size:
-            return  # Wait until we have a full chunk
-
-        # Get the current chunk and overlap from previous
-        chunk_start = max(0, len(self.previous_chunk_end) - self.overlap_size)
-        overlap = self.previous_chunk_end[chunk_start:]
-        new_chunk_words = overlap + self.current_words[:self.chunk_size]
-        
-        # Update previous chunk end for next overlap
-        self.previous_chunk_end = new_chunk_words[-self.overlap_size:]
-        
-        # Remove processed words (keep overlap for next chunk)
-        self.current_words = self.current_words[self.chunk_size:]
-        
-        # Upsert the new chunk with overlap
-        chunk_text = " ".join(new_chunk_words)
-        asyncio.create_task(self.upsert_to_vector_db(chunk_text))
-    
+            if result.end_time is not None:
+                # Speech-to-transcript delay of the newest word in this revision
+                observe_freshness("transcribe.result", self.chunker.stream_started_at + result.end_time)
+            seen = self.chunker.words_seen
+            chunks = self.chunker.add_result(result)
+            if self.chunker.words_seen > seen:
+                print("[Streaming]:", result.alternatives[0].transcript)  # Print streaming text
+            for chunk in chunks:
+                await self.store_chunk(chunk)
+        self.live_tail.update(self.chunker)
+
+    async def add_words(self, words):
+        """Commit already-final (text, start, end) words, e.g. from a stored transcript"""
+        for text, start, end in words:
+            self.chunker.commit_word(text, start, end)
+            while len(self.chunker.pending) >= self.chunker.chunk_size:
+                await self.store_chunk(self.chunker.cut())
+
+    async def log_chunk(self, chunk_text, metadata):
+        """Assign an id and make the chunk durable before it is embedded"""
+        chunk_id = make_chunk_id(metadata["event_id"], metadata["start_offset"], chunk_text)
+        offset = None
+        if self.chunk_log is not None:
+            offset = await self.chunk_log.append(chunk_id, chunk_text, metadata)
+        lexical_index.add(chunk_id, chunk_text, {"chunk": chunk_text, **metadata})  # Searchable before it's embedded
+        return chunk_id, offset
+
+    async def store_chunk(self, chunk):
+        # Upsert the new chunk with overlap; the rest of the dict is its timing metadata
+        metadata = {key: value for key, value in chunk.items() if key != "text"}
+        metadata["event_id"] = self.event_id
+        if chunk["position"] in self.provisional_tasks:
+            # The final text is indexed below; drop the provisional copy from BM25 now.
+            # Replay reads its id from the log to delete a copy a crash left behind
+            metadata["provisional_id"] = self.provisional_id(chunk["position"])
+            lexical_index.remove(metadata["provisional_id"])
+        self.chunks_emitted += 1
+        self.last_emitted_end = chunk["end_time"]
+        observe_freshness("chunk.emitted", chunk["end_time"])
+        chunk_id, offset = await self.log_chunk(chunk["text"], metadata)
+        self.summary.add_chunk(chunk["text"])
+        await self.pool.submit(chunk["text"], chunk_id, offset, metadata)  # Waits while the pool is saturated
+
+    async def watch_buffer(self):
+        """Keep the live tail current through pauses, and publish pending words
+        as a provisional chunk once they are max_staleness old"""
+        while True:
+            await asyncio.sleep(min(1.0, self.max_staleness / 4) if self.max_staleness > 0 else 1.0)
+            self.live_tail.update(self.chunker)
+            if self.max_staleness <= 0 or self.chunker.staleness() < self.max_staleness:
+                continue
+            if (self.chunker.consumed, self.chunker.words_seen) != self.provisional_key:
+                self.store_provisional()
+
+    def store_provisional(self):
+        chunk = self.chunker.provisional()
+        position = chunk["position"]
+        self.provisional_key = (position, self.chunker.words_seen)
+        metadata = {key: value for key, value in chunk.items() if key != "text"}
+        metadata["event_id"] = self.event_id
+        metadata["provisional"] = True
+        chunk_id = self.provisional_id(position)
+        lexical_index.add(chunk_id, chunk["text"], {"chunk": chunk["text"], **metadata})
+        # Refreshes of the same position reuse its id, so they overwrite each other
+        previous = self.provisional_tasks.get(position)
+        self.provisional_tasks[position] = asyncio.create_task(
+            self.upsert_provisional(previous, chunk["text"], chunk_id, metadata)
+        )
+
+    def provisional_id(self, position):
+        return provisional_chunk_id(self.event_id, position, self.session)
+
+    async def upsert_provisional(self, previous, chunk, chunk_id, metadata):
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)  # Keep refreshes in order
+        try:
+            await async_update_db(chunk, chunk_id, metadata)
+            observe_freshness("chunk.provisional_searchable", metadata["end_time"])
+        except Exception as e:
+            print(f"Failed to upsert provisional chunk: {str(e)}")
+
+    async def supersede(self, position):
+        """Delete the provisional chunk that a final chunk has replaced"""
+        task = self.provisional_tasks.pop(position, None)
+        if task is None:
+            return
+        await asyncio.gather(task, return_exceptions=True)  # Never delete before its upsert lands
+        try:
+            await delete_chunks([self.provisional_id(position)], namespace=self.event_id)
+        except Exception as e:
+            print(f"Failed to delete superseded provisional chunk: {str(e)}")
+
     async def final_flush(self):
-        if self.current_words:
-            # Combine remaining words with overlap
-            chunk_start = max(0, len(self.previous_chunk_end) - self.overlap_size)
-            chunk_text = " ".join(self.previous_chunk_end[chunk_start:] + self.current_words)
-            await self.upsert_to_vector_db(chunk_text)
+        if self.watcher is not None:
+            self.watcher.cancel()
+            self.watcher = None
+        chunk = self.chunker.flush()
+        if chunk:
+            await self.store_chunk(chunk)
+        self.live_tail.update(self.chunker, force=True)  # Everything is chunked now: an empty tail
+        await self.pool.drain()  # Wait for chunks already in flight
+        print(f"[Ingest] {self.pool.metrics()}")
+        await self.summary.close()
 
-    async def upsert_to_vector_db(self, chunk):
-        async with self.upsert_sem:
-            try:
-                # Use async version of update_db
-                await async_update_db(chunk)  # Requires implementing async_update_db
-                print(f"[Upserted] {chunk[:50]}...")
-            except Exception as e:
-                print(f"Failed to upsert: {str(e)}")
+    async def upsert_to_vector_db(self, chunk, chunk_id, offset=None, metadata=None):
+        try:
+            # Use async version of update_db
+            await async_update_db(chunk, chunk_id, metadata)
+            if offset is not None:
+                self.chunk_log.ack(offset)
+            self.chunks_upserted += 1
+            if metadata and "end_time" in metadata:
+                self.last_upserted_end = max(self.last_upserted_end or 0.0, metadata["end_time"])
+                observe_freshness("chunk.searchable", metadata["end_time"])  # Spoken -> in the index
+            if metadata and "position" in metadata:
+                await self.supersede(metadata["position"])
+        except Exception as e:
+            print(f"Failed to upsert, kept in chunk log for replay: {str(e)}")
+            raise
+
+# Microphone capture configuration
+sample_rate = 16000
+block_frames = 1024 * 2  # int16 mono samples per callback
 
-async def mic_stream():
-    loop = asyncio.get_running_loop()  # Updated to avoid errors
-    input_queue = asyncio.Queue()
+async def mic_stream(ring=None, device=None):
+    import sounddevice  # Deferred so the handler can be imported on machines without PortAudio
+    ring = ring or AudioFrameRing(frame_bytes=block_frames * 2)
 
     def callback(indata, frame_count, time_info, status):
-        loop.call_soon_threadsafe(input_queue.put_nowait, (bytes(indata), status))
+        ring.put(indata, status)
 
     stream = sounddevice.RawInputStream(
         channels=1,
-        samplerate=16000,
+        samplerate=sample_rate,
         callback=callback,
-        blocksize=1024 * 2,
+        blocksize=block_frames,
         dtype="int16",
+        device=device,
     )
     with stream:
         while True:
-            indata, status = await input_queue.get()
+            indata, status = await ring.get()
             yield indata, status
 
-async def write_chunks(stream):
-    async for chunk, status in mic_stream():
+async def write_chunks(stream, ring=None, device=None):
+    ring = ring or AudioFrameRing(frame_bytes=block_frames * 2)
+    async for chunk, status in mic_stream(ring, device):
         await stream.input_stream.send_audio_event(audio_chunk=chunk)
+        ring.mark_sent()
     await stream.input_stream.end_stream()
 
-async def basic_transcribe():
-    client = TranscribeStreamingClient(region="us-east-1")
-    stream = await client.start_stream_transcription(
+async def replay_chunk_log(chunk_log, batch_size=64):
+    """Bulk re-ingest chunks that were logged but never acknowledged"""
+    pending = chunk_log.unacknowledged()
+    if not pending:
+        chunk_log.compact()
+        return 0
+
+    started = time.perf_counter()
+    replayed = 0
+    for i in range(0, len(pending), batch_size):
+        wave = pending[i:i + batch_size]
+        for _, record in wave:
+            lexical_index.add(record["id"], record["chunk"], {"chunk": record["chunk"], **record["metadata"]})
+        results = await asyncio.gather(
+            *(async_update_db(record["chunk"], record["id"], record["metadata"]) for _, record in wave),
+            return_exceptions=True
+        )
+        superseded = {}
+        for (offset, record), result in zip(wave, results):
+            if not isinstance(result, BaseException):
+                chunk_log.ack(offset)
+                replayed += 1
+                metadata = record["metadata"]
+                if "position" in metadata:
+                    # A crashed session may have left the provisional copy behind
+                    namespace = metadata.get("event_id")
+                    provisional_id = metadata.get("provisional_id") or provisional_chunk_id(namespace, metadata["position"])
+                    superseded.setdefault(namespace, []).append(provisional_id)
+        for namespace, ids in superseded.items():
+            try:
+                await delete_chunks(ids, namespace=namespace)
+            except Exception as e:
+                print(f"Failed to delete superseded provisional chunks: {str(e)}")
+
+    print(f"[Replay] {replayed}/{len(pending)} chunks re-ingested in {time.perf_counter() - started:.1f}s")
+    chunk_log.compact()
+    return replayed
+
+async def replay_only():
+    await warm_up()
+    chunk_log = ChunkLog()
+    try:
+        await replay_chunk_log(chunk_log)
+    finally:
+        chunk_log.close()
+        await shutdown()
+
+async def open_transcribe_stream(client, media_sample_rate_hz=sample_rate):
+    return await client.start_stream_transcription(
         language_code="en-US",
-        media_sample_rate_hz=16000,
-        media_encoding="pcm"
+        media_sample_rate_hz=media_sample_rate_hz,
+        media_encoding="pcm",
+        enable_partial_results_stabilization=True,
+        partial_results_stability="high"
     )
-    handler = MyEventHandler(stream.output_stream)
-    
+
+async def basic_transcribe(event_id=None, on_handler=None):
+    """Stream the microphone through Transcribe into the index until cancelled
+
+    on_handler, if given, is called with the MyEventHandler once the stream
+    is open so a supervisor can report its status.
+    """
+    event_id = start_event(event_id)
+    start_periodic_dump("ingest")
+    await warm_up()
+    chunk_log = ChunkLog()
+    replay = asyncio.create_task(replay_chunk_log(chunk_log))
+    stream = await open_transcribe_stream(TranscribeStreamingClient(region="us-east-1"))
+    handler = MyEventHandler(stream.output_stream, chunk_log, event_id)
+    if on_handler is not None:
+        on_handler(handler)
+    ring = AudioFrameRing(frame_bytes=block_frames * 2)
+
     try:
         await asyncio.gather(
-            write_chunks(stream),
+            write_chunks(stream, ring),
             handler.handle_events(),
         )
     finally:
         await handler.final_flush()
         await stream.input_stream.end_stream()
+        print(f"[Audio] {ring.metrics()}")
+        await replay
+        await shutdown()
+        chunk_log.close()
 
 # Updated event loop handling for Python 3.11+
 if __name__ == "__main__":
     try:
-        asyncio.run(basic_transcribe())
+        if "--replay" in sys.argv:
+            asyncio.run(replay_only())  # Re-ingest unacknowledged chunks and exit
+        else:
+            asyncio.run(basic_transcribe())
     except KeyboardInterrupt:
         print("Streaming stopped by user.")
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+# Each histogram keeps its most recent samples for percentiles plus running totals
+histogram_window = int(os.getenv("METRICS_WINDOW", "4096"))
+metrics_dir = os.getenv("METRICS_DIR", "metrics")
+metrics_interval = float(os.getenv("METRICS_DUMP_INTERVAL", "30"))
+recent_events = int(os.getenv("METRICS_RECENT_EVENTS", "256"))  # records kept per event name
+
+
+class Histogram:
+    """Latency samples in milliseconds with p50/p95/p99 over a sliding window"""
+
+    def __init__(self, window=histogram_window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.samples.append(value)
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def summary(self):
+        with self.lock:
+            samples = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+            count, total, peak = self.count, self.total, self.max
+        if count == 0:
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {
+            "count": count,
+            "mean": total / count,
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": peak,
+        }
+
+
+histograms = {}
+counters = {}  # event counts, e.g. chunks upserted or vector searches that timed out
+events = {}  # name -> most recent records, for details a histogram can't hold
+_registry_lock = threading.Lock()
+
+
+def histogram(name):
+    if name not in histograms:
+        with _registry_lock:
+            histograms.setdefault(name, Histogram())
+    return histograms[name]
+
+
+def observe(name, value_ms):
+    histogram(name).observe(value_ms)
+
+
+def increment(name, amount=1):
+    with _registry_lock:
+        counters[name] = counters.get(name, 0) + amount
+
+
+@contextmanager
+def timer(name):
+    """Record the wall time of the with-block in milliseconds"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - started) * 1000)
+
+
+def observe_freshness(name, spoken_at, now=None):
+    """Record how long after a word was spoken (epoch seconds) a stage saw it"""
+    if spoken_at is None:
+        return
+    now = time.time() if now is None else now
+    observe(name, max(0.0, now - spoken_at) * 1000)
+
+
+def snapshot():
+    return {name: histograms[name].summary() for name in sorted(histograms)}
+
+
+def record_event(name, **fields):
+    """Keep a record like {"namespace": ..., "vectors": ..., "ms": ...}; the oldest are dropped"""
+    fields["at"] = time.time()
+    with _registry_lock:
+        if name not in events:
+            events[name] = deque(maxlen=recent_events)
+        events[name].append(fields)
+
+
+def recent(name):
+    with _registry_lock:
+        return list(events.get(name, ()))
+
+
+def events_snapshot():
+    with _registry_lock:
+        return {name: list(records) for name, records in sorted(events.items())}
+
+
+def counter_snapshot():
+    with _registry_lock:
+        return dict(sorted(counters.items()))
+
+
+def format_snapshot(stats=None, counts=None):
+    stats = snapshot() if stats is None else stats
+    counts = counter_snapshot() if counts is None else counts
+    lines = []
+    for name, s in stats.items():
+        if s["count"]:
+            lines.append(
+                f"{name:<28} n={s['count']:<6} p50={s['p50']:8.1f}ms "
+                f"p95={s['p95']:8.1f}ms p99={s['p99']:8.1f}ms max={s['max']:8.1f}ms"
+            )
+    for name, value in counts.items():
+        lines.append(f"{name:<28} {value}")
+    return "\n".join(lines)
+
+
+def dump(role):
+    """Atomically write this process's histograms, counters and recent events to METRICS_DIR/<role>.json"""
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = os.path.join(metrics_dir, f"{role}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "role": role,
+            "pid": os.getpid(),
+            "written_at": time.time(),
+            "histograms": snapshot(),
+            "counters": counter_snapshot(),
+            "events": events_snapshot(),
+        }, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+_dumpers = {}
+
+
+def start_periodic_dump(role, interval=metrics_interval):
+    """Dump and print the histograms every interval seconds; one thread per role"""
+    if role in _dumpers or interval <= 0:
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                dump(role)
+                report = format_snapshot()
+                if report:
+                    print(f"[Metrics:{role}]\n{report}")
+            except Exception as e:
+                print(f"Metrics dump failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name=f"metrics-{role}", daemon=True)
+    _dumpers[role] = thread
+    thread.start()
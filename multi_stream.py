@@ -0,0 +1,203 @@
+"""Transcribe several rooms at once in one process
+
+Usage:
+    python multi_stream.py room-a=mic:0 room-b=mic:2
+    python multi_stream.py keynote=talk.wav --copies 6 --max-backlog 5
+
+Each NAME=SOURCE runs its own Transcribe session and MyEventHandler and is
+ingested into namespace NAME. A SOURCE is "mic" or "mic:<device>" for a
+sounddevice input, or a 16-bit mono .wav/.pcm file played at real-time
+pace. --copies runs every file source that many times, which is how to
+find the number of streams one core sustains. All streams share one
+chunk log, one embedding batcher and one pool of ingest workers, served
+round-robin per stream (ingest_pool.FairIngestScheduler).
+
+Every --report-interval seconds each stream's lag is printed. "lag" is
+committed speech that is not searchable yet, including words still
+waiting to fill a chunk. "backlog" is speech that has been chunked but
+not yet upserted, which is the part that grows when the shared stage
+falls behind. The run is reported as sustained when every stream's p95
+backlog stays within --max-backlog seconds and the event loop's p95
+scheduling delay stays within --max-loop-delay milliseconds. The query
+side picks a room with EVENT_ID, since no stream becomes the active event.
+"""
+import sys
+import time
+import asyncio
+import argparse
+from amazon_transcribe.client import TranscribeStreamingClient
+from main import (MyEventHandler, open_transcribe_stream, write_chunks, replay_chunk_log, sample_rate,
+                  block_frames)
+from ragEmbed import warm_up, shutdown
+from chunk_log import ChunkLog
+from ingest_pool import FairIngestScheduler
+from audio_buffer import AudioFrameRing
+from bulk_ingest import read_audio
+from metrics import histogram, observe, start_periodic_dump
+
+loop_probe_interval = 0.1
+
+
+def parse_sources(specs, copies=1):
+    """{event id: source} from NAME=SOURCE arguments"""
+    sources = {}
+    for i, spec in enumerate(specs):
+        name, _, source = spec.rpartition("=")
+        name = name or f"stream-{i + 1}"
+        if source.startswith("mic") or copies <= 1:
+            sources[name] = source
+        else:
+            for copy in range(copies):
+                sources[f"{name}-{copy + 1}"] = source
+    return sources
+
+
+def backlog(handler):
+    """Seconds of chunked speech that is not upserted yet"""
+    if handler.last_emitted_end is None:
+        return 0.0
+    return max(0.0, handler.last_emitted_end - (handler.last_upserted_end or handler.chunker.stream_started_at))
+
+
+class StreamSupervisor:
+    """Runs one Transcribe session per source on the current event loop"""
+
+    def __init__(self, sources, region="us-east-1", report_interval=5.0):
+        self.sources = sources
+        self.region = region
+        self.report_interval = report_interval
+        self.scheduler = FairIngestScheduler()
+        self.handlers = {}
+        self.errors = {}
+
+    async def play_file(self, stream, audio, rate):
+        """Send recorded audio in microphone-sized blocks at real-time pace"""
+        block = block_frames * 2
+        started = time.monotonic()
+        for i, start in enumerate(range(0, len(audio), block)):
+            delay = started + i * block_frames / rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await stream.input_stream.send_audio_event(audio_chunk=audio[start:start + block])
+        await stream.input_stream.end_stream()
+
+    async def run_stream(self, event_id, source, chunk_log):
+        if source.startswith("mic"):
+            device = source.partition(":")[2] or None
+            audio, rate = None, sample_rate
+        else:
+            audio, rate = read_audio(source, sample_rate)
+        stream = await open_transcribe_stream(TranscribeStreamingClient(region=self.region), rate)
+        handler = MyEventHandler(stream.output_stream, chunk_log, event_id, scheduler=self.scheduler)
+        self.handlers[event_id] = handler
+        print(f"[Streams] {event_id} <- {source}")
+        if audio is None:
+            ring = AudioFrameRing(frame_bytes=block_frames * 2)
+            sender = write_chunks(stream, ring, int(device) if device and device.isdigit() else device)
+        else:
+            sender = self.play_file(stream, audio, rate)
+        try:
+            await asyncio.gather(sender, handler.handle_events())
+        finally:
+            await handler.final_flush()
+
+    async def probe_loop(self):
+        """Record how late the event loop wakes up; it grows once the core is saturated"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + loop_probe_interval
+            await asyncio.sleep(loop_probe_interval)
+            observe("supervisor.loop_delay", max(0.0, loop.time() - expected) * 1000)
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            parts = []
+            for event_id, handler in list(self.handlers.items()):
+                lag = handler.lag()
+                behind = backlog(handler)
+                observe(f"stream.{event_id}.backlog", behind * 1000)
+                if lag is not None:
+                    observe(f"stream.{event_id}.lag", lag * 1000)
+                parts.append(
+                    f"{event_id}: lag {lag or 0.0:.1f}s backlog {behind:.1f}s "
+                    f"queued {handler.pool.metrics()['queue_depth']}"
+                )
+            if parts:
+                print("[Streams] " + " | ".join(parts))
+
+    def status(self):
+        return {event_id: handler.status() for event_id, handler in self.handlers.items()}
+
+    def summary(self, max_backlog, max_loop_delay):
+        streams = {}
+        for event_id, handler in self.handlers.items():
+            lag = histogram(f"stream.{event_id}.lag").summary()
+            behind = histogram(f"stream.{event_id}.backlog").summary()
+            streams[event_id] = {
+                "chunks_upserted": handler.chunks_upserted,
+                "failed": handler.pool.failed,
+                "lag_p95_s": lag["p95"] / 1000 if lag["count"] else None,
+                "backlog_p95_s": behind["p95"] / 1000 if behind["count"] else None,
+                "backlog_max_s": behind["max"] / 1000 if behind["count"] else None,
+            }
+        delay = histogram("supervisor.loop_delay").summary()
+        loop_delay_p95 = delay["p95"] if delay["count"] else 0.0
+        sustained = (
+            not self.errors
+            and loop_delay_p95 <= max_loop_delay
+            and all((s["backlog_p95_s"] or 0.0) <= max_backlog for s in streams.values())
+        )
+        return {
+            "streams": streams,
+            "errors": self.errors,
+            "loop_delay_p95_ms": loop_delay_p95,
+            "sustained": sustained,
+        }
+
+    async def run(self, max_backlog=5.0, max_loop_delay=100.0):
+        start_periodic_dump("ingest")
+        await warm_up()
+        chunk_log = ChunkLog()
+        replay = asyncio.create_task(replay_chunk_log(chunk_log))
+        monitors = [asyncio.create_task(self.probe_loop()), asyncio.create_task(self.report())]
+        try:
+            results = await asyncio.gather(
+                *(self.run_stream(event_id, source, chunk_log) for event_id, source in self.sources.items()),
+                return_exceptions=True
+            )
+            for event_id, result in zip(self.sources, results):
+                if isinstance(result, BaseException):
+                    # One failed room does not stop the others
+                    print(f"[Streams] {event_id} failed: {str(result)}")
+                    self.errors[event_id] = str(result)
+        finally:
+            for task in monitors:
+                task.cancel()
+            await self.scheduler.drain()
+            await replay
+            await shutdown()
+            chunk_log.close()
+        summary = self.summary(max_backlog, max_loop_delay)
+        print(f"[Streams] {summary}")
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="NAME=SOURCE, where SOURCE is mic, mic:<device> or a file")
+    parser.add_argument("--copies", type=int, default=1, help="streams started per file source")
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="seconds between lag reports")
+    parser.add_argument("--max-backlog", type=float, default=5.0, help="p95 backlog seconds a stream may reach")
+    parser.add_argument("--max-loop-delay", type=float, default=100.0, help="p95 event-loop delay in ms")
+    args = parser.parse_args()
+
+    supervisor = StreamSupervisor(parse_sources(args.sources, args.copies), args.region, args.report_interval)
+    try:
+        summary = asyncio.run(supervisor.run(args.max_backlog, args.max_loop_delay))
+    except KeyboardInterrupt:
+        print("Streaming stopped by user.")
+        sys.exit(0)
+    print("sustained" if summary["sustained"] else "not sustained")
+    sys.exit(0 if summary["sustained"] else 1)
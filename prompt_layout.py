@@ -0,0 +1,96 @@
+import os
+import threading
+from context_packer import estimate_tokens
+
+# Prompt caching: "auto" adds a cache checkpoint for models known to support
+# it, "on" always adds one and "off" never does
+prompt_cache_mode = os.getenv("PROMPT_CACHE", "auto").lower()
+# Model id fragment -> fewest prefix tokens Bedrock will cache for that model
+cacheable_models = {
+    "claude-3-7": 1024, "claude-3-5-haiku": 2048, "claude-sonnet-4": 1024, "claude-opus-4": 1024,
+    "claude-haiku-4": 2048, "amazon.nova": 1024,
+}
+# Minimum for models not listed above, and an override for all of them
+prompt_cache_min_tokens = os.getenv("PROMPT_CACHE_MIN_TOKENS")
+
+default_turn_template = """<context>
+{context}
+</context>
+
+Question: {question}
+
+Helpful Answer:"""
+
+
+def supports_prompt_cache(model_id):
+    if prompt_cache_mode == "off" or not model_id:
+        return False
+    if prompt_cache_mode == "on":
+        return True
+    return any(name in model_id for name in cacheable_models)
+
+
+def min_cache_tokens(model_id):
+    """Shortest prefix, in tokens, that the model caches"""
+    if prompt_cache_min_tokens:
+        return int(prompt_cache_min_tokens)
+    return next((tokens for name, tokens in cacheable_models.items() if name in (model_id or "")), 1024)
+
+
+class PromptLayout:
+    """A chat prompt split into a static prefix and a per-request turn
+
+    The instructions go into the system prompt, byte-identical on every
+    request, followed by a cache checkpoint when the model supports one.
+    The retrieved context and the question only appear in the user turn,
+    after the checkpoint, so the model can reuse the cached prefix. Bedrock
+    only caches prefixes above a model-specific minimum length, so in
+    "auto" mode instructions shorter than min_cache_tokens get no
+    checkpoint and are sent uncached.
+    """
+
+    def __init__(self, instructions, turn_template=default_turn_template):
+        self.instructions = instructions.strip()
+        self.turn_template = turn_template
+
+    def system(self, model_id):
+        blocks = [{"text": self.instructions}]
+        if self.cacheable(model_id):
+            blocks.append({"cachePoint": {"type": "default"}})
+        return blocks
+
+    def cacheable(self, model_id):
+        if not supports_prompt_cache(model_id):
+            return False
+        return prompt_cache_mode == "on" or estimate_tokens(self.instructions) >= min_cache_tokens(model_id)
+
+    def messages(self, context, question):
+        text = self.turn_template.format(context=context, question=question)
+        return [{"role": "user", "content": [{"text": text}]}]
+
+
+# Cumulative input-token accounting across answers
+prompt_cache_stats = {"requests": 0, "input_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0}
+_stats_lock = threading.Lock()
+
+
+def record_usage(usage):
+    """Add a converse usage block to prompt_cache_stats; returns this request's split"""
+    usage = usage or {}
+    split = {
+        "uncached_tokens": usage.get("inputTokens", 0),
+        "cache_read_tokens": usage.get("cacheReadInputTokens", 0),
+        "cache_write_tokens": usage.get("cacheWriteInputTokens", 0),
+    }
+    with _stats_lock:
+        prompt_cache_stats["requests"] += 1
+        prompt_cache_stats["input_tokens"] += split["uncached_tokens"]
+        prompt_cache_stats["cache_read_tokens"] += split["cache_read_tokens"]
+        prompt_cache_stats["cache_write_tokens"] += split["cache_write_tokens"]
+    return split
+
+
+def cached_fraction():
+    """Share of all input tokens that were served from the prompt cache"""
+    total = sum(prompt_cache_stats[key] for key in ("input_tokens", "cache_read_tokens", "cache_write_tokens"))
+    return prompt_cache_stats["cache_read_tokens"] / total if total else 0.0
@@ -0,0 +1,114 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Cache configuration
+embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+embedding_cache_ttl = float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))
+retrieval_cache_size = int(os.getenv("RETRIEVAL_CACHE_SIZE", "256"))
+retrieval_cache_ttl = float(os.getenv("RETRIEVAL_CACHE_TTL", "30"))
+# Touched on every bump so query processes see ingestion from other processes
+generation_path = os.getenv("CACHE_GENERATION_FILE", ".cache_generation")
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+embedding_cache = LRUTTLCache(embedding_cache_size, embedding_cache_ttl)
+retrieval_cache = LRUTTLCache(retrieval_cache_size, retrieval_cache_ttl)
+
+# Bumped by ingestion after every acknowledged upsert so cached retrievals
+# never hide newly spoken content. The counter covers this process and the
+# generation file's mtime covers ingestion running in another one, the same
+# way .active_event shares the current event.
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def bump_generation():
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        try:
+            with open(generation_path, "a"):
+                pass
+            os.utime(generation_path)
+        except OSError:
+            pass  # Other processes fall back to the retrieval cache TTL
+        return _generation
+
+
+def current_generation():
+    try:
+        shared = os.stat(generation_path).st_mtime_ns
+    except OSError:
+        shared = 0
+    return _generation, shared
+
+
+def normalize_query(query):
+    """Canonical form used as the embedding cache key"""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.strip(" ?!.,;:")
+
+
+def embedding_key(embedding):
+    """Stable hash of a query embedding"""
+    return hashlib.sha1(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+
+def retrieval_key(embedding, top_k, *scope):
+    return (embedding_key(embedding), top_k, *scope, current_generation())
+
+
+def cache_stats():
+    return {
+        "embedding": embedding_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+        "generation": current_generation(),
+    }
@@ -1,12 +1,20 @@
 from pinecone import Pinecone
-import aioboto3
-from uuid import uuid4
 from tenacity import retry, wait_exponential, stop_after_attempt
-from asyncio import Semaphore
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import asyncio
 import json
-from datetime import datetime
-timestamp = datetime.utcnow().isoformat() 
+import os
+import time
+from datetime import datetime, timezone
+from clients import manager
+from hot_tier import hot_window
+from vector_store import get_vector_store, vector_backend
+from query_cache import bump_generation
+from events import current_event
+from metrics import observe, increment, record_event
+from chunker import chunk_id as make_chunk_id, content_hash
+from embedding_store import EmbeddingStore
 
 # Initialize Pinecone client
 pc = Pinecone(
@@ -23,16 +31,58 @@ serverless_config = {
     "region": "us-west-1"
 }
 
-# Global semaphore for rate limiting
-upsert_semaphore = Semaphore(5)
+# Batching configuration: a batch is flushed when it reaches batch_size chunks
+# or when its oldest chunk has waited batch_max_wait seconds
+batch_size = int(os.getenv("EMBED_BATCH_SIZE", "16"))
+batch_max_wait = float(os.getenv("EMBED_BATCH_MAX_WAIT", "0.5"))
+embed_concurrency = int(os.getenv("EMBED_CONCURRENCY", "8"))
+
+
+class LoopLocal:
+    """An asyncio primitive created on first use in each event loop
+
+    Locks and semaphores belong to the loop they first wait on, and the
+    ingest service, benchmarks and bulk runs each start their own loop.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.loop = None
+        self.value = None
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.value = self.factory()
+            self.loop = loop
+        return self.value
+
+
+class ChunkUpsertError(Exception):
+    """A chunk of a batch that could not be embedded or upserted"""
+
+    def __init__(self, chunk_id, error):
+        super().__init__(f"chunk {chunk_id}: {error}")
+        self.chunk_id = chunk_id
+        self.error = error
+
+
+# Rate limit on concurrent Bedrock embedding calls
+embed_semaphore = LoopLocal(lambda: asyncio.Semaphore(embed_concurrency))
+
+# Dedicated pool for the blocking vector-store upserts so they don't starve the
+# event loop's default executor
+upsert_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vector-upsert")
+# SQLite reads and commits of the embedding cache, also kept off the event loop
+cache_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache")
 
 # Initialize clients
-index = None  # Pinecone index
-bedrock_session = None
+store = None  # Vector store (Pinecone or local), opened by startup()
+embedding_store = None  # Persistent embedding cache, opened by startup()
+startup_lock = LoopLocal(asyncio.Lock)  # Concurrent first flushes must not initialize twice
 
 def initialize_pinecone():
     """Initialize Pinecone index with serverless configuration"""
-    global index
     try:
         if index_name not in pc.list_indexes().names():
             pc.create_index(
@@ -43,75 +93,220 @@ def initialize_pinecone():
             )
             print(f"Created new serverless index: {index_name}")
         
-        index = pc.Index(index_name)  # Synchronous instance
     except Exception as e:
         print(f"Pinecone initialization failed: {str(e)}")
         raise
 
 async def initialize_clients():
     """Initialize all async clients"""
-    global bedrock_session
+    global store, embedding_store
     try:
-        initialize_pinecone()  # Keep this synchronous
-        bedrock_session = aioboto3.Session()
+        if vector_backend == "pinecone":
+            # Blocking Pinecone control-plane calls, kept off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, initialize_pinecone)
+        store = get_vector_store(index_name=index_name, api_key=pc.config.api_key)
+        embedding_store = EmbeddingStore()
         print("Clients initialized successfully")
     except Exception as e:
         print(f"Client initialization failed: {str(e)}")
         raise
 
-@retry(wait=wait_exponential(multiplier=1, min=2, max=10), 
-       stop=stop_after_attempt(3),
-       reraise=True)
-async def async_update_db(chunk: str):
-    """Asynchronously process and upsert a chunk with retries"""
-    global index, bedrock_session
-    
-    try:
-        async with upsert_semaphore:
-            chunk_id = str(uuid4())
-            
-            async with bedrock_session.client(
-                service_name='bedrock-runtime',
-                region_name='us-east-1'
-            ) as bedrock:
-                input_data = {
-                    "inputText": chunk,
-                    "dimensions": 1024,
-                    "normalize": True
-                }
-                response = await bedrock.invoke_model(
-                    modelId=modelId,
-                    contentType="application/json",
-                    accept="*/*",
-                    body=json.dumps(input_data)
-                )
-                response_body = await response['body'].read()
-                response_json = json.loads(response_body)
-                embedding = response_json['embedding']
+async def embed_chunk(bedrock, chunk: str):
+    """Embed a single chunk with Titan"""
+    async with embed_semaphore.get():
+        input_data = {
+            "inputText": chunk,
+            "dimensions": 1024,
+            "normalize": True
+        }
+        response = await bedrock.invoke_model(
+            modelId=modelId,
+            contentType="application/json",
+            accept="*/*",
+            body=json.dumps(input_data)
+        )
+        response_body = await response['body'].read()
+        response_json = json.loads(response_body)
+        return response_json['embedding']
+
+
+class EmbedBatcher:
+    """Collects chunks and flushes them as one multi-vector upsert per batch"""
+
+    def __init__(self, max_size=batch_size, max_wait=batch_max_wait):
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.pending = []  # (chunk, chunk id, metadata, future) waiting for the next flush
+        self.timer = None
+        self.flushes = set()  # in-flight flush tasks, kept so they aren't GC'd
+
+    async def submit(self, chunk: str, chunk_id: str, metadata: dict):
+        """Queue a chunk and wait until its batch has been upserted"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((chunk, chunk_id, metadata, future))
+
+        if len(self.pending) >= self.max_size:
+            self._schedule_flush()
+        elif self.timer is None:
+            self.timer = loop.create_task(self._flush_after_deadline())
 
-            # Run Pinecone upsert in a separate thread
+        return await future
+
+    async def _flush_after_deadline(self):
+        await asyncio.sleep(self.max_wait)
+        self.timer = None
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self.flush(batch))
+        self.flushes.add(task)
+        task.add_done_callback(self.flushes.discard)
+
+    async def drain(self):
+        """Flush whatever is pending and wait for all in-flight batches"""
+        self._schedule_flush()
+        if self.flushes:
+            await asyncio.gather(*self.flushes, return_exceptions=True)
+
+    async def flush(self, batch):
+        """Embed a batch concurrently and upsert it with a single request"""
+        started = time.perf_counter()
+        chunks = [chunk for chunk, _, _, _ in batch]
+
+        # Only content never embedded with this model goes to Titan, once per batch
+        hashes = [content_hash(chunk) for chunk in chunks]
+        fresh = {}
+        try:
+            await startup()  # No-op once warm_up() has run
             loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, index.upsert, [{
+            cached = await loop.run_in_executor(cache_executor, embedding_store.get_many, modelId, hashes)
+            missing = {h: chunk for h, chunk in zip(hashes, chunks) if h not in cached}
+            if missing:
+                bedrock = await manager.async_bedrock()
+                results = await asyncio.gather(
+                    *(embed_chunk(bedrock, chunk) for chunk in missing.values()),
+                    return_exceptions=True
+                )
+                fresh = dict(zip(missing, results))
+                await loop.run_in_executor(
+                    cache_executor, embedding_store.put_many,
+                    modelId, [(h, e) for h, e in fresh.items() if not isinstance(e, BaseException)]
+                )
+            embeddings = [cached[h] if h in cached else fresh[h] for h in hashes]
+        except Exception as e:
+            embeddings = [e] * len(batch)
+        embedded_at = time.perf_counter()
+
+        vectors, embedded, failed = [], [], []
+        for (chunk, chunk_id, metadata, future), embedding in zip(batch, embeddings):
+            if isinstance(embedding, BaseException):
+                failed.append((chunk_id, future, embedding))
+                continue
+            vector = {
                 "id": chunk_id,
                 "values": embedding,
                 "metadata": {
                     "chunk": chunk,
-                    "time_param": timestamp  # Store time inside metadata
+                    **metadata  # Per-chunk audio offsets and wall-clock times
                 }
-            }])
+            }
+            vectors.append(vector)
+            embedded.append((vector, future))
+
+        if vectors:
+            loop = asyncio.get_running_loop()
+            # One upsert per event namespace (replayed chunks may belong to an older event)
+            namespaces = {}
+            for vector in vectors:
+                namespaces.setdefault(vector["metadata"].get("event_id", ""), []).append(vector)
+            try:
+                for namespace, group in namespaces.items():
+                    await loop.run_in_executor(upsert_executor, partial(store.upsert_batch, group, namespace=namespace))
+            except Exception as e:
+                failed.extend((vector["id"], future, e) for vector, future in embedded)
+                embedded = []
+            for vector, future in embedded:
+                # Searchable in-process before Pinecone has indexed it, once the upsert is acknowledged
+                hot_window.add(vector["id"], vector["values"], vector["metadata"])
+                if not future.done():
+                    future.set_result(True)
+        finished = time.perf_counter()
+
+        for chunk_id, future, error in failed:
+            if not future.done():
+                future.set_exception(ChunkUpsertError(chunk_id, error))
+        if failed:
+            failed_ids = [chunk_id for chunk_id, _, _ in failed]
+            print(f"[Batch Failed] {len(failed)}/{len(batch)} chunks: {', '.join(failed_ids)} ({failed[0][2]})")
+            record_event("ingest.failed_chunks", ids=failed_ids, errors=sorted({str(e) for _, _, e in failed}))
+
+        observe("ingest.embed_batch", (embedded_at - started) * 1000)
+        observe("ingest.upsert_batch", (finished - embedded_at) * 1000)
+        increment("ingest.batches")
+        increment("ingest.chunks_upserted", len(batch) - len(failed))
+        increment("ingest.chunks_failed", len(failed))
+
+
+batcher = EmbedBatcher()
+
+@retry(wait=wait_exponential(multiplier=1, min=2, max=10), 
+       stop=stop_after_attempt(3),
+       reraise=True)
+async def async_update_db(chunk: str, chunk_id: str = None, metadata: dict = None):
+    """Asynchronously process and upsert a chunk with retries"""
+    if not metadata:
+        now = time.time()
+        metadata = {
+            "start_time": now,
+            "end_time": now,
+            "time_param": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            "event_id": current_event()
+        }
+    try:
+        chunk_id = chunk_id or make_chunk_id(
+            metadata.get("event_id"), metadata.get("start_offset", metadata.get("start_time", 0.0)), chunk
+        )
+        await batcher.submit(chunk, chunk_id, metadata)
+        bump_generation()  # Invalidates cached retrievals here and, via its file, in query processes
+        return True
 
-            print(f"[Async Updated] {chunk[:50]}...")
-            return True
-            
     except Exception as e:
         print(f"UPSERT ERROR: {str(e)}")
         raise  
 
+async def delete_chunks(chunk_ids, namespace=""):
+    """Remove chunks from the vector store and the hot window"""
+    await startup()
+    for chunk_id in chunk_ids:
+        hot_window.remove(chunk_id)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(upsert_executor, partial(store.delete_ids, list(chunk_ids), namespace=namespace))
+    bump_generation()
+
 async def startup():
-    await initialize_clients()
+    """Check the index and open the vector store; later calls are no-ops"""
+    if store is not None:
+        return
+    async with startup_lock.get():
+        if store is None:
+            await initialize_clients()
+
+async def warm_up():
+    """Start up and open the pooled ingest connections on the running loop"""
+    await startup()
+    await manager.warm_up()
 
-try:
-    asyncio.run(startup())
-except Exception as e:
-    print(f"Application failed to start: {str(e)}")
-    exit(1)
\ No newline at end of file
+async def shutdown():
+    """Flush pending batches and close the ingest clients"""
+    await batcher.drain()
+    await manager.aclose()
+    print(f"[Clients] {manager.connection_stats()}")
+    if embedding_store is not None:
+        print(f"[Embedding Cache] {embedding_store.stats()}")
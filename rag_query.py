@@ -1,7 +1,4 @@
 import os
-import boto3
-import asyncio
-import json
 import time
 import streamlit as st
 import streamlit_authenticator as stauth
@@ -9,28 +6,36 @@ from threading import Thread
 import yaml
 from yaml.loader import SafeLoader
 from dotenv import load_dotenv
-from pinecone import Pinecone
-load_dotenv()
+load_dotenv()  # before local imports, which read their config at import time
+from clients import manager
+from retrieval import answer_from_event, stream_answer_from_event
+from query_cache import cache_stats
+from prompt_layout import PromptLayout, prompt_cache_stats, cached_fraction
+from metrics import start_periodic_dump
+from vector_store import vector_backend
 
 # Access environment variables
-aws_region = os.getenv("AWS_REGION")
-modelId = os.getenv("MODEL_ID")
-emb_modelId = os.getenv("EMB_MODEL_ID")
-pinecone_api_key = os.getenv("PINECONE_API_KEY")
 index_name = os.getenv("PINECONE_INDEX_NAME")
 
-# Create session and clients
-bedrock = boto3.client(service_name='bedrock-runtime', region_name="us-east-1")
-
+# Shared, connection-pooled clients, created once per server process. Warm-up,
+# which also opens the Pinecone index, runs in the background so the first
+# page renders without waiting on the network; a failure shows in the sidebar.
 @st.cache_resource
-def init_pinecone():
-    pc = Pinecone(api_key=pinecone_api_key)
-    return pc.Index(index_name)
+def warm_up_clients():
+    status = {"error": None}
+
+    def run():
+        status["error"] = manager.warm_up_sync(index_name if vector_backend == "pinecone" else None)
 
-# Initialize the Pinecone index
-index = init_pinecone()
+    Thread(target=run, daemon=True).start()
+    start_periodic_dump("query")
+    return status
 
-prompt_template = """ 
+warm_up_status = warm_up_clients()
+
+# Static instructions, kept byte-identical across requests so the model can
+# cache them; the retrieved context and the question go into the user turn
+prompt = PromptLayout(""" 
 <profile>
     <name>Yharn</name>
 You are an AI assistant with access to knowledge about any event or conversation. You respond to the user question as if you have the event or conversation in your knowledge base.
@@ -49,11 +54,6 @@ Your Task:
     Instead, say: "The last point made was about funding."
 
 </profile>
-<context>
-{context}
-</context>
-
-Question: {question}
 
 <Your Thought Process>
 1. Read the User Question
@@ -65,61 +65,30 @@ Question: {question}
 
 
 </Your Thought Process>
-
-Helpful Answer:
-"""
+""")
 
 def get_answer_from_event(query):
-    input_data = {
-        "inputText": query,
-        "dimensions": 1024,
-        "normalize": True
-    }
-
-    body = json.dumps(input_data).encode('utf-8')
-    response = bedrock.invoke_model(
-        modelId=emb_modelId,
-        contentType="application/json",
-        accept="*/*",
-        body=body
-    )
+    return answer_from_event(query, prompt)
 
-    response_body = response['body'].read()
-    response_json = json.loads(response_body)
-    query_embedding = response_json['embedding']
-
-    result = index.query(vector=query_embedding, top_k=3, include_metadata=True)
-
-    context = [f"Score: {match['score']}, Metadata: {match['metadata']}" for match in result['matches']]
-    context_string = "\n".join(context)
-    
-    message_list = [{"role": "user", "content": [{"text": query}]}]
-    response = bedrock.converse(
-        modelId=modelId,
-        messages=message_list,
-        system=[
-            {"text": prompt_template.format(context=context_string, question=query)},
-        ],
-        inferenceConfig={"maxTokens": 2000, "temperature": 1},
-    )
-    
-    response_message = response['output']['message']['content'][0]['text']
-    return response_message
-
-# Load configuration
-with open('config.yaml') as file:
-    config = yaml.load(file, Loader=SafeLoader)
-
-# Initialize authenticator
-authenticator = stauth.Authenticate(
-    config['credentials'],
-    config['cookie']['name'],
-    config['cookie']['key'],
-    config['cookie']['expiry_days']
-)
+def stream_answer(query):
+    return stream_answer_from_event(query, prompt)
 
+# Load configuration once per server process
+@st.cache_resource
+def load_config():
+    with open('config.yaml') as file:
+        return yaml.load(file, Loader=SafeLoader)
+
+# Initialize authenticator once per browser session rather than on every rerun
 if 'authenticator' not in st.session_state:
-    st.session_state['authenticator'] = authenticator
+    config = load_config()
+    st.session_state['authenticator'] = stauth.Authenticate(
+        config['credentials'],
+        config['cookie']['name'],
+        config['cookie']['key'],
+        config['cookie']['expiry_days']
+    )
+authenticator = st.session_state['authenticator']
 
 authenticator.login('main')
 
@@ -153,17 +122,7 @@ if st.session_state.get("authentication_status"):
 
             if len(st.session_state.messages) == 0:
                 assistant_message = "Hello! How can I assist you with the event today?"
-                st.session_state.messages.append({"role": "assistant", "content": ""})  # Initialize with empty content
-                
-                placeholder = st.empty()  # Placeholder for streaming
-                
-                streamed_text = ""
-                for char in assistant_message:
-                    streamed_text += char
-                    placeholder.markdown(f"**{streamed_text}**")  # Update dynamically
-                    time.sleep(0.01)  # Adjust speed of typing effect
-
-                st.session_state.messages[-1]["content"] = streamed_text  # Store final message
+                st.session_state.messages.append({"role": "assistant", "content": assistant_message})
 
             for message in st.session_state.messages:
                 with st.chat_message(message["role"]):
@@ -174,11 +133,9 @@ if st.session_state.get("authentication_status"):
                 with st.chat_message("user"):
                     st.markdown(user_input)
 
-                with st.spinner("Generating response..."):
-                    assistant_response = get_answer_from_event(user_input)
-
                 with st.chat_message("assistant"):
-                    st.markdown(assistant_response)
+                    # Tokens are rendered as they arrive from the model
+                    assistant_response = st.write_stream(stream_answer(user_input))
                 st.session_state.messages.append({"role": "assistant", "content": assistant_response})
 
         with st.sidebar:
@@ -187,6 +144,21 @@ if st.session_state.get("authentication_status"):
                 st.write("You have logged out successfully!")
                 st.stop()
 
+            if warm_up_status["error"]:
+                st.warning(f"Could not reach Bedrock or the vector index: {warm_up_status['error']}")
+
+            # Query cache effectiveness
+            stats = cache_stats()
+            for name in ("embedding", "retrieval"):
+                st.caption(
+                    f"{name.title()} cache: {stats[name]['hits']} hits / "
+                    f"{stats[name]['misses']} misses ({stats[name]['hit_rate']:.0%})"
+                )
+            st.caption(
+                f"Prompt cache: {prompt_cache_stats['cache_read_tokens']} cached / "
+                f"{prompt_cache_stats['input_tokens']} uncached input tokens ({cached_fraction():.0%})"
+            )
+
     elif st.session_state["name"] == 'yk':
         st.title("Welcome to Yharn NonTranscribe 🎙️")
 
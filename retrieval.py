@@ -0,0 +1,310 @@
+import os
+import re
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from dotenv import load_dotenv
+load_dotenv()  # before local imports, which read their config at import time
+from clients import manager
+from hot_tier import hot_window, merge_matches
+from vector_store import get_vector_store
+from query_cache import embedding_cache, retrieval_cache, normalize_query, retrieval_key
+from lexical_index import lexical_index, chunk_log_follower, lexical_follow_log, reciprocal_rank_fusion
+from events import current_event
+from context_packer import pack_context, estimate_tokens, context_token_budget
+from event_summary import is_overview_question, load_summary
+from live_tail import is_live_question, load_tail, render_tail
+from prompt_layout import record_usage
+from metrics import observe, observe_freshness, timer, increment, record_event
+
+# Access environment variables
+modelId = os.getenv("MODEL_ID")
+emb_modelId = os.getenv("EMB_MODEL_ID")
+pinecone_api_key = os.getenv("PINECONE_API_KEY")
+index_name = os.getenv("PINECONE_INDEX_NAME")
+
+# How long a question waits for the vector path before answering from
+# lexical matches alone
+vector_timeout = float(os.getenv("VECTOR_SEARCH_TIMEOUT", "3"))
+vector_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vector-search")
+
+# Recency rescoring: a chunk spoken just now gets its score boosted by
+# recency_weight, decaying by half every recency_half_life seconds
+recency_weight = float(os.getenv("RECENCY_WEIGHT", "0.5"))
+recency_half_life = float(os.getenv("RECENCY_HALF_LIFE", "600"))
+
+time_window_pattern = re.compile(
+    r"\b(?:last|past|previous)\s+(?:(\d+|a few|few|a couple of|couple of)\s+)?(second|sec|minute|min|hour|hr)s?\b",
+    re.IGNORECASE
+)
+time_units = {"second": 1, "sec": 1, "minute": 60, "min": 60, "hour": 3600, "hr": 3600}
+vague_counts = {"a few": 3, "few": 3, "a couple of": 2, "couple of": 2}
+
+# Matches retrieved per question; pack_context keeps as many as fit the token budget
+context_candidates = int(os.getenv("CONTEXT_CANDIDATES", "8"))
+
+
+def embed_query(query):
+    """Embed a user question with Titan, reusing cached embeddings of the same question"""
+    key = normalize_query(query)
+    cached = embedding_cache.get(key)
+    if cached is not None:
+        return cached
+
+    input_data = {
+        "inputText": query,
+        "dimensions": 1024,
+        "normalize": True
+    }
+
+    body = json.dumps(input_data).encode('utf-8')
+    with timer("query.embed"):
+        response = manager.bedrock().invoke_model(
+            modelId=emb_modelId,
+            contentType="application/json",
+            accept="*/*",
+            body=body
+        )
+        response_body = response['body'].read()
+
+    response_json = json.loads(response_body)
+    embedding = response_json['embedding']
+    embedding_cache.put(key, embedding)
+    return embedding
+
+
+def parse_time_window(query):
+    """Seconds covered by phrases like "last 5 minutes" or "past hour", else None"""
+    match = time_window_pattern.search(query)
+    if match is None:
+        return None
+    count, unit = match.groups()
+    if count is None:
+        count = 1
+    elif count.lower() in vague_counts:
+        count = vague_counts[count.lower()]
+    return int(count) * time_units[unit.lower()]
+
+
+def recency_rescore(matches, now=None):
+    """Boost recently spoken chunks; returns rescored copies sorted by score"""
+    now = time.time() if now is None else now
+    rescored = []
+    for match in matches:
+        age = max(0.0, now - match["metadata"].get("end_time", now))
+        boost = 1 + recency_weight * 0.5 ** (age / recency_half_life)
+        rescored.append({**match, "score": match["score"] * boost})
+    return sorted(rescored, key=lambda m: m["score"], reverse=True)
+
+
+# Vector count per namespace, recorded next to each search's latency. It is
+# refreshed at most every namespace_size_ttl seconds on its own thread, so
+# describe_index_stats never runs on the query path.
+namespace_size_ttl = float(os.getenv("NAMESPACE_SIZE_TTL", "60"))
+namespace_sizes = {"sizes": {}, "sized_at": 0.0, "refreshing": False}
+sizing_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="namespace-size")
+
+
+def refresh_namespace_sizes(store):
+    try:
+        namespace_sizes["sizes"] = store.namespace_sizes()
+    except Exception as e:
+        print(f"Could not size namespaces: {str(e)}")
+    finally:
+        namespace_sizes["sized_at"] = time.time()
+        namespace_sizes["refreshing"] = False
+
+
+def namespace_size(store, namespace):
+    """Last known vector count of a namespace, or None before the first refresh"""
+    if not namespace_sizes["refreshing"] and time.time() - namespace_sizes["sized_at"] > namespace_size_ttl:
+        namespace_sizes["refreshing"] = True
+        sizing_pool.submit(refresh_namespace_sizes, store)
+    return namespace_sizes["sizes"].get(namespace or "")
+
+
+def retrieve(query_embedding, top_k=3, since=None, namespace=None):
+    """Query the vector store and the in-process hot window, merged by chunk id
+
+    since restricts the search server-side to chunks whose speech ended at
+    or after that epoch time. namespace defaults to the active event.
+    """
+    namespace = current_event() if namespace is None else namespace
+    # Windows are cached in 10s buckets so "last 5 minutes" stays cacheable
+    key = retrieval_key(query_embedding, top_k, namespace, None if since is None else int(since // 10))
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        return cached
+
+    time_filter = None if since is None else {"end_time": {"$gte": since}}
+    store = get_vector_store(index_name=index_name, api_key=pinecone_api_key)
+    started = time.perf_counter()
+    cold = store.query(query_embedding, top_k=top_k, filter=time_filter, namespace=namespace)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    observe("query.vector_search", elapsed_ms)
+    observe(f"query.vector_search.{namespace or 'default'}", elapsed_ms)  # Per event, to spot large namespaces
+    record_event("query.vector_search", namespace=namespace, vectors=namespace_size(store, namespace), ms=elapsed_ms)
+    hot = hot_window.search(query_embedding, top_k=top_k, since=since, namespace=namespace)
+    matches = merge_matches(cold, hot, top_k=top_k)
+    retrieval_cache.put(key, matches)
+    return matches
+
+
+def hybrid_retrieve(query, top_k=3, since_seconds=None):
+    """Fuse BM25 and vector matches with reciprocal-rank fusion
+
+    The lexical lookup is local and answers immediately; the vector path is
+    given vector_timeout seconds and skipped if Bedrock or the index is slow.
+    since_seconds limits both to the last N seconds of speech, and the fused
+    list is rescored for recency.
+    """
+    started = time.perf_counter()
+    since = None if since_seconds is None else time.time() - since_seconds
+    candidates = top_k * 2
+    namespace = current_event()  # The in-process tiers hold every event ingested here
+    future = vector_pool.submit(
+        lambda: retrieve(embed_query(query), top_k=candidates, since=since, namespace=namespace)
+    )
+    with timer("query.lexical"):
+        if lexical_follow_log:
+            chunk_log_follower.poll()  # Chunks logged by a separate ingest process
+        lexical = lexical_index.search(query, top_k=candidates, since=since, namespace=namespace)
+
+    try:
+        vector = future.result(timeout=vector_timeout)
+    except TimeoutError:
+        increment("query.vector_timeout")  # Answered from lexical matches alone
+        vector = []
+    except Exception as e:
+        increment("query.vector_failed")
+        print(f"Vector search failed, answering from lexical matches: {str(e)}")
+        vector = []
+
+    fused = reciprocal_rank_fusion(vector, lexical, top_k=candidates)
+    observe("query.retrieve", (time.perf_counter() - started) * 1000)
+    return recency_rescore(fused)[:top_k]
+
+
+# Chunks already returned by some query, so each one's freshness is recorded once
+answered_chunks = OrderedDict()
+answered_chunks_limit = 10000
+
+
+def record_first_answered(matches, now=None):
+    """Spoken-to-first-retrieved delay for chunks no earlier query has seen"""
+    now = time.time() if now is None else now
+    for match in matches:
+        if match["id"] in answered_chunks:
+            continue
+        answered_chunks[match["id"]] = True
+        observe_freshness("chunk.first_answered", match["metadata"].get("end_time"), now)
+    while len(answered_chunks) > answered_chunks_limit:
+        answered_chunks.popitem(last=False)
+
+
+def build_answer_request(query, prompt, since_seconds=None):
+    """Retrieve event context for a question and build the converse request
+
+    prompt is a PromptLayout: its static instructions form a cacheable
+    system prefix and the context and question go into the user turn.
+    Questions like "what was said in the last 5 minutes" are restricted to
+    that window unless since_seconds is given explicitly. Overview questions
+    about the whole event are answered from its rolling summary instead.
+    The live tail, the newest words that are not in any chunk yet, is always
+    appended; questions about what is being said right now get only the
+    tail, without an embedding or index lookup.
+    """
+    if since_seconds is None:
+        since_seconds = parse_time_window(query)
+    event_id = current_event()
+    tail_text = render_tail(load_tail(event_id))
+    summary = None
+    if since_seconds is None and is_overview_question(query):
+        summary = load_summary(event_id)
+    if summary and summary["text"]:
+        increment("query.context.summary")
+        context_string = summary["text"]
+    elif tail_text and since_seconds is None and is_live_question(query):
+        increment("query.context.live_tail")
+        context_string = ""
+    else:
+        matches = hybrid_retrieve(query, top_k=context_candidates, since_seconds=since_seconds)
+        record_first_answered(matches)
+        budget = max(context_token_budget // 2, context_token_budget - estimate_tokens(tail_text))
+        context_string = pack_context(matches, budget=budget)
+    if tail_text:
+        context_string = f"{context_string}\n\nSpoken just now, not yet indexed:\n{tail_text}".lstrip()
+
+    return {
+        "modelId": modelId,
+        "messages": prompt.messages(context_string, query),
+        "system": prompt.system(modelId),
+        "inferenceConfig": {"maxTokens": 2000, "temperature": 1},
+    }
+
+
+# Timings of the most recent answer, in milliseconds
+last_answer_timing = {"time_to_first_token_ms": None, "total_ms": None, "streamed": None}
+# Input-token split of the most recent answer
+last_answer_usage = {}
+
+
+def answer_from_event(query, prompt, since_seconds=None, bedrock=None):
+    """Retrieve event context for a question and answer it with the chat model"""
+    bedrock = bedrock or manager.bedrock()
+    started = time.perf_counter()
+    response = bedrock.converse(**build_answer_request(query, prompt, since_seconds))
+    last_answer_usage.update(record_usage(response.get('usage')))
+    response_message = response['output']['message']['content'][0]['text']
+
+    elapsed = (time.perf_counter() - started) * 1000
+    last_answer_timing.update(time_to_first_token_ms=elapsed, total_ms=elapsed, streamed=False)
+    observe("answer.total", elapsed)
+    return response_message
+
+
+def stream_answer_from_event(query, prompt, since_seconds=None, bedrock=None):
+    """Yield the answer text as the model generates it
+
+    Falls back to a single converse call when the streaming API fails before
+    the first token arrives.
+    """
+    bedrock = bedrock or manager.bedrock()
+    started = time.perf_counter()
+    request = build_answer_request(query, prompt, since_seconds)
+    requested_at = time.perf_counter()
+    first_token_at = None
+    streamed = True
+
+    try:
+        response = bedrock.converse_stream(**request)
+        for event in response['stream']:
+            if 'metadata' in event:
+                last_answer_usage.update(record_usage(event['metadata'].get('usage')))
+            text = event.get('contentBlockDelta', {}).get('delta', {}).get('text')
+            if text:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                yield text
+    except Exception as e:
+        if first_token_at is not None:
+            raise  # Part of the answer is already on screen; don't repeat it
+        print(f"Streaming failed, falling back to converse: {str(e)}")
+        streamed = False
+        response = bedrock.converse(**request)
+        last_answer_usage.update(record_usage(response.get('usage')))
+        first_token_at = time.perf_counter()
+        yield response['output']['message']['content'][0]['text']
+    finally:
+        finished = time.perf_counter()
+        last_answer_timing.update(
+            time_to_first_token_ms=(first_token_at - started) * 1000 if first_token_at else None,
+            total_ms=(finished - started) * 1000,
+            streamed=streamed,
+        )
+        if first_token_at:
+            observe("llm.time_to_first_token", (first_token_at - requested_at) * 1000)
+            observe("answer.time_to_first_token", (first_token_at - started) * 1000)
+        observe("llm.total", (finished - requested_at) * 1000)
+        observe("answer.total", (finished - started) * 1000)
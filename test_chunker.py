@@ -0,0 +1,48 @@
+"""Checks that TranscriptChunker commits every spoken word exactly once
+
+Run with ``python -m pytest``; bench_chunker.py measures throughput on the
+same synthetic talk.
+"""
+import pytest
+from chunker import TranscriptChunker
+from bench_chunker import synthetic_talk, strip_overlap
+
+
+def chunk_talk(events, chunker):
+    chunks = []
+    for event in events:
+        for result in event.transcript.results:
+            chunks.extend(chunker.add_result(result))
+    tail = chunker.flush()
+    if tail:
+        chunks.append(tail)
+    return chunks
+
+
+@pytest.mark.parametrize("chunk_size,overlap_size", [(200, 70), (40, 10), (15, 0)])
+def test_chunks_reproduce_spoken_transcript(chunk_size, overlap_size):
+    # No leaked partial revisions, nothing dropped or repeated
+    events, spoken = synthetic_talk(5000)
+    chunker = TranscriptChunker(chunk_size=chunk_size, overlap_size=overlap_size)
+    chunks = chunk_talk(events, chunker)
+    assert strip_overlap(chunks, overlap_size) == spoken
+
+
+def test_adaptive_chunks_reproduce_spoken_transcript():
+    events, spoken = synthetic_talk(5000)
+    chunker = TranscriptChunker(chunk_size=100, overlap_size=20, target_seconds=15, min_size=30, max_size=150)
+    chunks = chunk_talk(events, chunker)
+    assert strip_overlap(chunks, 20) == spoken
+    assert all(len(chunk["text"].split()) <= 150 + 20 for chunk in chunks)
+
+
+def test_provisional_chunk_matches_final_chunk():
+    events, _ = synthetic_talk(300)
+    chunker = TranscriptChunker(chunk_size=1000, overlap_size=10)
+    for event in events:
+        for result in event.transcript.results:
+            assert chunker.add_result(result) == []
+    provisional = chunker.provisional()
+    assert provisional["position"] == chunker.consumed
+    assert chunker.provisional() == provisional  # Nothing was consumed
+    assert chunker.flush() == provisional
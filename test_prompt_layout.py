@@ -0,0 +1,52 @@
+"""Prompt caching of the static instructions, driven through FakeBedrock"""
+import os
+import tempfile
+
+# Offline configuration; must be in place before the pipeline modules are imported
+os.environ.setdefault("VECTOR_STORE", "memory")
+os.environ.setdefault("EVENT_ID", "prompt-cache-test")
+os.environ.setdefault("SUMMARY_DIR", tempfile.mkdtemp(prefix="test-summaries-"))
+os.environ.setdefault("LIVE_TAIL_DIR", tempfile.mkdtemp(prefix="test-tail-"))
+os.environ.setdefault("CACHE_GENERATION_FILE", os.path.join(tempfile.mkdtemp(prefix="test-"), "generation"))
+os.environ.setdefault("LEXICAL_FOLLOW_LOG", "0")
+
+import pytest
+from clients import manager
+from fakes import FakeBedrock
+from prompt_layout import PromptLayout, min_cache_tokens
+import retrieval
+
+cache_model = "anthropic.claude-sonnet-4-20250514-v1:0"
+long_instructions = "Answer questions about the event using only the retrieved context. " * 70  # ~1200 tokens
+
+
+@pytest.fixture
+def bedrock(monkeypatch):
+    fake = FakeBedrock(cache_min_tokens=min_cache_tokens(cache_model))
+    manager.override(bedrock=fake)
+    monkeypatch.setattr(retrieval, "modelId", cache_model)
+    yield fake
+    manager.override()
+
+
+def test_instructions_are_written_then_read_from_the_cache(bedrock):
+    prompt = PromptLayout(long_instructions)
+    request = retrieval.build_answer_request("What was said about funding?", prompt)
+    assert request["system"][-1] == {"cachePoint": {"type": "default"}}
+
+    retrieval.answer_from_event("What was said about funding?", prompt, bedrock=bedrock)
+    written = dict(retrieval.last_answer_usage)
+    retrieval.answer_from_event("Who is joining the pilot?", prompt, bedrock=bedrock)
+    read = dict(retrieval.last_answer_usage)
+    assert written["cache_write_tokens"] > 0 and written["cache_read_tokens"] == 0
+    assert read["cache_read_tokens"] == written["cache_write_tokens"] and read["cache_write_tokens"] == 0
+
+
+def test_short_instructions_get_no_checkpoint(bedrock):
+    prompt = PromptLayout("Answer questions about the event using the context.")
+    request = retrieval.build_answer_request("What was said about funding?", prompt)
+    assert not any("cachePoint" in block for block in request["system"])
+
+    retrieval.answer_from_event("What was said about funding?", prompt, bedrock=bedrock)
+    assert retrieval.last_answer_usage["cache_write_tokens"] == 0
+    assert retrieval.last_answer_usage["cache_read_tokens"] == 0
@@ -0,0 +1,572 @@
+import os
+import json
+import glob
+import fcntl
+import shutil
+import threading
+import numpy as np
+from clients import manager
+
+# Backend selection: "pinecone" (default), "local" or "memory"
+vector_backend = os.getenv("VECTOR_STORE", "pinecone")
+local_store_path = os.getenv("LOCAL_STORE_PATH", "vector_store")
+segment_rows = int(os.getenv("LOCAL_SEGMENT_ROWS", "4096"))
+dimension = 1024
+
+
+class VectorStore:
+    """Minimal vector-store interface used by the ingest and query paths
+
+    Every call is scoped to a namespace; each event gets its own, and ""
+    is the backend's default namespace.
+    """
+
+    def upsert_batch(self, vectors, namespace=""):
+        """Insert or replace a list of {"id", "values", "metadata"} records"""
+        raise NotImplementedError
+
+    def query(self, vector, top_k=3, filter=None, include_values=False, namespace=""):
+        """Return up to top_k matches as {"id", "score", "metadata"} dicts"""
+        raise NotImplementedError
+
+    def delete_ids(self, ids, namespace=""):
+        """Delete the given vector ids; unknown ids are ignored"""
+        raise NotImplementedError
+
+    def delete_by_filter(self, filter, namespace=""):
+        """Delete every vector whose metadata matches a Pinecone-style filter"""
+        raise NotImplementedError
+
+    def delete_all(self, namespace=""):
+        """Delete every vector in one namespace"""
+        raise NotImplementedError
+
+    def namespace_sizes(self):
+        """Vector count per namespace"""
+        raise NotImplementedError
+
+    def archive_namespace(self, namespace, path):
+        """Move one namespace out of the live store into path"""
+        raise NotImplementedError
+
+
+class PineconeStore(VectorStore):
+    """Pinecone index behind the VectorStore interface"""
+
+    def __init__(self, index_name, api_key=None):
+        self.index_name = index_name
+        self.index = manager.index(index_name, api_key=api_key)
+
+    def upsert_batch(self, vectors, namespace=""):
+        self.index.upsert(vectors=vectors, namespace=namespace)
+
+    def query(self, vector, top_k=3, filter=None, include_values=False, namespace=""):
+        result = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            filter=filter,
+            include_metadata=True,
+            include_values=include_values,
+            namespace=namespace
+        )
+        matches = []
+        for match in result['matches']:
+            entry = {"id": match['id'], "score": match['score'], "metadata": match['metadata']}
+            if include_values:
+                entry["values"] = match['values']
+            matches.append(entry)
+        return matches
+
+    def delete_ids(self, ids, namespace=""):
+        if ids:
+            self.index.delete(ids=list(ids), namespace=namespace)
+
+    def delete_by_filter(self, filter, namespace=""):
+        # Metadata-filtered deletes are only supported on pod-based indexes
+        self.index.delete(filter=filter, namespace=namespace)
+
+    def delete_all(self, namespace=""):
+        # Dropping a namespace is a single call on serverless indexes too
+        self.index.delete(delete_all=True, namespace=namespace)
+
+    def namespace_sizes(self):
+        stats = self.index.describe_index_stats()
+        return {name: info['vector_count'] for name, info in stats['namespaces'].items()}
+
+    def archive_namespace(self, namespace, path):
+        """Export a namespace to a JSON-lines file, then drop it from the index"""
+        with open(path, "w") as f:
+            for ids in self.index.list(namespace=namespace):
+                fetched = self.index.fetch(ids=ids, namespace=namespace)
+                for vector_id, vector in fetched.vectors.items():
+                    f.write(json.dumps({
+                        "id": vector_id,
+                        "values": list(vector.values),
+                        "metadata": vector.metadata
+                    }) + "\n")
+        self.delete_all(namespace=namespace)
+
+
+def matches_filter(metadata, filter):
+    """Evaluate a Pinecone-style metadata filter against one metadata dict"""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, target in condition.items():
+            if op == "$eq" and value != target:
+                return False
+            if op == "$ne" and value == target:
+                return False
+            if op == "$in" and value not in target:
+                return False
+            if op == "$nin" and value in target:
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > target:
+                    return False
+                if op == "$gte" and not value >= target:
+                    return False
+                if op == "$lt" and not value < target:
+                    return False
+                if op == "$lte" and not value <= target:
+                    return False
+    return True
+
+
+class LocalNamespace:
+    """One namespace of the local store, built from append-only memory-mapped segments
+
+    Each segment is a raw float32 file of normalized vectors (``.vec``) with a
+    JSON-lines metadata sidecar (``.meta.jsonl``) holding one record per row.
+    Upserts and deletes only ever append; the newest row for an id wins and
+    deletes are recorded as tombstone records in the sidecar.
+
+    One process writes a namespace: the first write takes an exclusive lock
+    on its ``.writer.lock`` file and only then cuts a torn tail left by a
+    crash. Other processes (the query app) read without the lock, never
+    truncate, ignore rows past the last complete metadata line and pick up
+    appended rows and new segments on their next query.
+    """
+
+    def __init__(self, path, dim=dimension, rows_per_segment=segment_rows):
+        self.path = path
+        self.dim = dim
+        self.rows_per_segment = rows_per_segment
+        self.lock = threading.Lock()
+        self.writer_lock = None  # open lock file once this process is the writer
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _segment_path(self, number, suffix):
+        return os.path.join(self.path, f"segment-{number:06d}{suffix}")
+
+    def _segment_numbers(self):
+        return sorted(
+            int(os.path.basename(vec_path)[len("segment-"):-len(".vec")])
+            for vec_path in glob.glob(os.path.join(self.path, "segment-*.vec"))
+        )
+
+    def _load(self, repair=False):
+        self.segments = []  # per segment: {"number", "rows", "ids", "metadata", "live", "mmap", "meta_bytes"}
+        self.locations = {}  # id -> (segment position, row)
+        for number in self._segment_numbers():
+            self.segments.append(self._new_segment(number))
+            self._read_sidecar(len(self.segments) - 1)
+            if repair:
+                # Cut both files back to the last complete record so appends stay aligned
+                segment = self.segments[-1]
+                os.truncate(self._segment_path(number, ".meta.jsonl"), segment["meta_bytes"])
+                os.truncate(self._segment_path(number, ".vec"), segment["rows"] * self.dim * 4)
+
+    def _read_sidecar(self, position):
+        """Apply the sidecar records appended since the last read of this segment
+
+        Stops before a line that is incomplete or whose vector row is not
+        written yet; it is read again on the next refresh.
+        """
+        segment = self.segments[position]
+        file_rows = os.path.getsize(self._segment_path(segment["number"], ".vec")) // (self.dim * 4)
+        with open(self._segment_path(segment["number"], ".meta.jsonl"), "rb") as f:
+            f.seek(segment["meta_bytes"])
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write, or a write still in progress
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if "delete" in record:
+                    self._forget(record["delete"])
+                elif segment["rows"] < file_rows:
+                    self._place(position, record["id"], record["metadata"])
+                else:
+                    break
+                segment["meta_bytes"] += len(line)
+
+    def _refresh(self):
+        """Pick up rows another process appended; the caller holds the lock"""
+        if self.writer_lock is not None:
+            return  # Everything on disk was written by this process
+        try:
+            self._read_appended()
+        except FileNotFoundError:
+            self._load()  # A segment vanished mid-read: the namespace was deleted or archived
+
+    def _read_appended(self):
+        numbers = self._segment_numbers()
+        known = [segment["number"] for segment in self.segments]
+        if numbers[:len(known)] != known:
+            self._load()  # The namespace was deleted or rewritten
+            return
+        if self.segments:
+            segment = self.segments[-1]
+            meta_path = self._segment_path(segment["number"], ".meta.jsonl")
+            if os.path.getsize(meta_path) < segment["meta_bytes"]:
+                self._load()
+                return
+            if os.path.getsize(meta_path) > segment["meta_bytes"]:
+                self._read_sidecar(len(self.segments) - 1)
+        for number in numbers[len(known):]:
+            self.segments.append(self._new_segment(number))
+            self._read_sidecar(len(self.segments) - 1)
+
+    def _become_writer(self):
+        """Take the namespace's writer lock and repair torn tails; the caller holds the lock"""
+        if self.writer_lock is not None:
+            return
+        lock_file = open(os.path.join(self.path, ".writer.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(f"Another process is writing the local namespace at {self.path}")
+        self.writer_lock = lock_file
+        self._load(repair=True)
+
+    def _new_segment(self, number):
+        return {"number": number, "rows": 0, "ids": [], "metadata": [], "live": [], "mmap": None, "meta_bytes": 0}
+
+    def _forget(self, chunk_id):
+        location = self.locations.pop(chunk_id, None)
+        if location is not None:
+            position, row = location
+            self.segments[position]["live"][row] = False
+
+    def _place(self, position, chunk_id, metadata):
+        self._forget(chunk_id)
+        segment = self.segments[position]
+        segment["ids"].append(chunk_id)
+        segment["metadata"].append(metadata)
+        segment["live"].append(True)
+        self.locations[chunk_id] = (position, segment["rows"])
+        segment["rows"] += 1
+
+    def _writable_segment(self):
+        if not self.segments or self.segments[-1]["rows"] >= self.rows_per_segment:
+            number = self.segments[-1]["number"] + 1 if self.segments else 0
+            open(self._segment_path(number, ".vec"), "ab").close()
+            open(self._segment_path(number, ".meta.jsonl"), "a").close()
+            self.segments.append(self._new_segment(number))
+        return self.segments[-1]
+
+    def _mmap(self, segment):
+        # Re-map only when the segment has grown since the last query
+        mapped = segment["mmap"]
+        if mapped is None or mapped.shape[0] != segment["rows"]:
+            if segment["rows"] == 0:
+                return None
+            mapped = np.memmap(
+                self._segment_path(segment["number"], ".vec"),
+                dtype=np.float32, mode="r", shape=(segment["rows"], self.dim)
+            )
+            segment["mmap"] = mapped
+        return mapped
+
+    def upsert_batch(self, vectors):
+        with self.lock:
+            self._become_writer()
+            remaining = list(vectors)
+            while remaining:
+                segment = self._writable_segment()
+                room = self.rows_per_segment - segment["rows"]
+                batch, remaining = remaining[:room], remaining[room:]
+
+                values = np.asarray([v["values"] for v in batch], dtype=np.float32)
+                norms = np.linalg.norm(values, axis=1, keepdims=True)
+                values = values / np.where(norms == 0, 1, norms)
+
+                with open(self._segment_path(segment["number"], ".vec"), "ab") as f:
+                    f.write(values.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(self._segment_path(segment["number"], ".meta.jsonl"), "a") as f:
+                    for v in batch:
+                        line = json.dumps({"id": v["id"], "metadata": v.get("metadata", {})}) + "\n"
+                        f.write(line)
+                        segment["meta_bytes"] += len(line.encode())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                for v in batch:
+                    self._place(len(self.segments) - 1, v["id"], v.get("metadata", {}))
+
+    def query(self, vector, top_k=3, filter=None, include_values=False):
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+
+        candidates = []
+        with self.lock:
+            self._refresh()
+            for segment in self.segments:
+                mapped = self._mmap(segment)
+                if mapped is None:
+                    continue
+                live = np.flatnonzero(segment["live"])
+                if filter:
+                    live = [row for row in live if matches_filter(segment["metadata"][row], filter)]
+                    live = np.asarray(live, dtype=np.int64)
+                if len(live) == 0:
+                    continue
+                scores = mapped[live] @ query
+                k = min(top_k, len(live))
+                best = np.argpartition(-scores, k - 1)[:k]
+                for i in best:
+                    row = live[i]
+                    match = {
+                        "id": segment["ids"][row],
+                        "score": float(scores[i]),
+                        "metadata": segment["metadata"][row]
+                    }
+                    if include_values:
+                        match["values"] = mapped[row].tolist()
+                    candidates.append(match)
+
+        candidates.sort(key=lambda m: m["score"], reverse=True)
+        return candidates[:top_k]
+
+    def delete_ids(self, ids):
+        with self.lock:
+            self._become_writer()
+            self._tombstone([chunk_id for chunk_id in ids if chunk_id in self.locations])
+
+    def delete_by_filter(self, filter):
+        with self.lock:
+            self._become_writer()
+            self._tombstone([
+                chunk_id for chunk_id, (seg, row) in self.locations.items()
+                if matches_filter(self.segments[seg]["metadata"][row], filter)
+            ])
+
+    def _tombstone(self, doomed):
+        """Durably mark ids as deleted; the caller holds the lock"""
+        if doomed:
+            segment = self._writable_segment()
+            with open(self._segment_path(segment["number"], ".meta.jsonl"), "a") as f:
+                for chunk_id in doomed:
+                    line = json.dumps({"delete": chunk_id}) + "\n"
+                    f.write(line)
+                    segment["meta_bytes"] += len(line.encode())
+                f.flush()
+                os.fsync(f.fileno())
+            for chunk_id in doomed:
+                self._forget(chunk_id)
+
+    def delete_all(self):
+        with self.lock:
+            self._become_writer()
+            for name in os.listdir(self.path):
+                if name.startswith("segment-"):
+                    os.remove(os.path.join(self.path, name))
+            self.segments = []
+            self.locations = {}
+
+    def __len__(self):
+        with self.lock:
+            self._refresh()
+            return len(self.locations)
+
+
+class LocalStore(VectorStore):
+    """Persistent local store with one directory of segments per namespace"""
+
+    default_namespace = "__default__"
+
+    def __init__(self, path=local_store_path, dim=dimension, rows_per_segment=segment_rows):
+        self.path = path
+        self.dim = dim
+        self.rows_per_segment = rows_per_segment
+        self.namespaces = {}
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _namespace_path(self, namespace):
+        return os.path.join(self.path, namespace or self.default_namespace)
+
+    def _namespace(self, namespace, create=True):
+        with self.lock:
+            if namespace not in self.namespaces:
+                path = self._namespace_path(namespace)
+                if not create and not os.path.isdir(path):
+                    return None
+                self.namespaces[namespace] = LocalNamespace(path, self.dim, self.rows_per_segment)
+            return self.namespaces[namespace]
+
+    def upsert_batch(self, vectors, namespace=""):
+        self._namespace(namespace).upsert_batch(vectors)
+
+    def query(self, vector, top_k=3, filter=None, include_values=False, namespace=""):
+        store = self._namespace(namespace, create=False)
+        if store is None:
+            return []
+        return store.query(vector, top_k=top_k, filter=filter, include_values=include_values)
+
+    def delete_ids(self, ids, namespace=""):
+        store = self._namespace(namespace, create=False)
+        if store is not None:
+            store.delete_ids(ids)
+
+    def delete_by_filter(self, filter, namespace=""):
+        store = self._namespace(namespace, create=False)
+        if store is not None:
+            store.delete_by_filter(filter)
+
+    def delete_all(self, namespace=""):
+        with self.lock:
+            self.namespaces.pop(namespace, None)
+            shutil.rmtree(self._namespace_path(namespace), ignore_errors=True)
+
+    def namespace_sizes(self):
+        sizes = {}
+        for name in sorted(os.listdir(self.path)):
+            if os.path.isdir(os.path.join(self.path, name)):
+                namespace = "" if name == self.default_namespace else name
+                sizes[namespace] = len(self._namespace(namespace))
+        return sizes
+
+    def archive_namespace(self, namespace, path):
+        """Move the namespace's segment directory out of the live store"""
+        with self.lock:
+            self.namespaces.pop(namespace, None)
+            shutil.move(self._namespace_path(namespace), path)
+
+
+class MemoryStore(VectorStore):
+    """Non-persistent in-process store, for benchmarks and offline development"""
+
+    def __init__(self, dim=dimension):
+        self.dim = dim
+        self.namespaces = {}  # namespace -> {id: (unit vector, metadata)}
+        self.matrices = {}  # namespace -> (ids, stacked vectors), rebuilt after writes
+        self.lock = threading.Lock()
+
+    def upsert_batch(self, vectors, namespace=""):
+        with self.lock:
+            records = self.namespaces.setdefault(namespace, {})
+            for v in vectors:
+                values = np.asarray(v["values"], dtype=np.float32)
+                norm = np.linalg.norm(values)
+                records[v["id"]] = (values / norm if norm else values, v.get("metadata", {}))
+            self.matrices.pop(namespace, None)
+
+    def _matrix(self, namespace):
+        if namespace not in self.matrices:
+            records = self.namespaces.get(namespace, {})
+            ids = list(records)
+            matrix = np.stack([records[i][0] for i in ids]) if ids else np.zeros((0, self.dim), np.float32)
+            self.matrices[namespace] = (ids, matrix)
+        return self.matrices[namespace]
+
+    def query(self, vector, top_k=3, filter=None, include_values=False, namespace=""):
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        with self.lock:
+            records = self.namespaces.get(namespace, {})
+            ids, matrix = self._matrix(namespace)
+            rows = np.arange(len(ids))
+            if filter:
+                rows = np.asarray([r for r in rows if matches_filter(records[ids[r]][1], filter)], dtype=np.int64)
+            if len(rows) == 0:
+                return []
+            scores = matrix[rows] @ (query / norm)
+            k = min(top_k, len(rows))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            matches = []
+            for i in best:
+                chunk_id = ids[rows[i]]
+                match = {"id": chunk_id, "score": float(scores[i]), "metadata": records[chunk_id][1]}
+                if include_values:
+                    match["values"] = records[chunk_id][0].tolist()
+                matches.append(match)
+            return matches
+
+    def delete_ids(self, ids, namespace=""):
+        with self.lock:
+            records = self.namespaces.get(namespace, {})
+            for chunk_id in ids:
+                records.pop(chunk_id, None)
+            self.matrices.pop(namespace, None)
+
+    def delete_by_filter(self, filter, namespace=""):
+        with self.lock:
+            records = self.namespaces.get(namespace, {})
+            for chunk_id in [i for i, (_, metadata) in records.items() if matches_filter(metadata, filter)]:
+                del records[chunk_id]
+            self.matrices.pop(namespace, None)
+
+    def delete_all(self, namespace=""):
+        with self.lock:
+            self.namespaces.pop(namespace, None)
+            self.matrices.pop(namespace, None)
+
+    def namespace_sizes(self):
+        with self.lock:
+            return {namespace: len(records) for namespace, records in self.namespaces.items()}
+
+    def archive_namespace(self, namespace, path):
+        """Write the namespace out as JSON lines and drop it from memory"""
+        with self.lock:
+            records = self.namespaces.pop(namespace, {})
+            self.matrices.pop(namespace, None)
+        with open(path, "w") as f:
+            for chunk_id, (values, metadata) in records.items():
+                f.write(json.dumps({"id": chunk_id, "values": values.tolist(), "metadata": metadata}) + "\n")
+
+
+_stores = {}
+
+
+def get_vector_store(backend=None, index_name=None, api_key=None):
+    """Return the process-wide store for the configured backend"""
+    backend = backend or vector_backend
+    index_name = index_name or os.getenv("PINECONE_INDEX_NAME")
+    key = (backend, {"pinecone": index_name, "local": local_store_path}.get(backend))
+    if key not in _stores:
+        if backend == "pinecone":
+            _stores[key] = PineconeStore(index_name, api_key=api_key)
+        elif backend == "local":
+            _stores[key] = LocalStore()
+        elif backend == "memory":
+            _stores[key] = MemoryStore()
+        else:
+            raise ValueError(f"Unknown vector store backend: {backend}")
+    return _stores[key]